@@ -0,0 +1,18 @@
+import strawberry
+import typing
+from strawberry.fastapi import BaseContext
+from strawberry.types import Info as _Info
+from strawberry.types.info import RootValueType
+from app.db.catalog import catalog
+from app.utils.catalog_utils import Role
+from app.security.validation import require_admin
+
+Info = _Info[BaseContext, RootValueType]
+
+
+@strawberry.type
+class CatalogQuery:
+    @strawberry.field
+    def roles(self, info: Info) -> typing.List[Role]:
+        require_admin(info)
+        return catalog.roles()
@@ -0,0 +1,47 @@
+import strawberry
+import typing
+from graphql import GraphQLError
+from starlette.concurrency import run_in_threadpool
+from strawberry.fastapi import BaseContext
+from strawberry.types import Info as _Info
+from strawberry.types.info import RootValueType
+from app.api.comments import comments
+from app.api.projects import projects
+from app.api.tasks import tasks
+from app.db.changes import sync_watermark, tombstone_horizon, tombstones_since
+from app.db.config import shared_connection
+from app.utils.changes_utils import ChangeSet, Cursor, EntityType, Tombstone
+from app.security.validation import require_admin
+
+Info = _Info[BaseContext, RootValueType]
+
+synced = {EntityType.PROJECT: projects, EntityType.TASK: tasks, EntityType.COMMENT: comments}
+
+
+def fetch_changes(since, types: list) -> ChangeSet:
+    with shared_connection():
+        if since is not None and since <= tombstone_horizon():
+            raise GraphQLError("Sync cursor expired, sync again without since", extensions={"code": "CURSOR_EXPIRED"})
+        watermark = sync_watermark()
+        if since is not None and since >= watermark:
+            return ChangeSet(projects=[], tasks=[], comments=[], deleted=[], cursor=since)
+
+        changed = {entity_type: synced[entity_type].changed(since or 0, watermark)
+                   for entity_type in types}
+        # A first sync has nothing to delete
+        deleted = [] if since is None else [
+            Tombstone(entity_type=EntityType(entity_type), entity_id=entity_id, deleted_at=deleted_at)
+            for entity_type, entity_id, deleted_at in tombstones_since([t.value for t in types], since, watermark)
+        ]
+
+    return ChangeSet(projects=changed.get(EntityType.PROJECT, []), tasks=changed.get(EntityType.TASK, []),
+                     comments=changed.get(EntityType.COMMENT, []), deleted=deleted, cursor=watermark)
+
+
+@strawberry.type
+class ChangesQuery:
+    @strawberry.field
+    async def changes(self, info: Info, since: typing.Optional[Cursor] = None,
+                      types: typing.Optional[typing.List[EntityType]] = None) -> ChangeSet:
+        require_admin(info)
+        return await run_in_threadpool(fetch_changes, since, types or list(EntityType))
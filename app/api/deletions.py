@@ -0,0 +1,30 @@
+import strawberry
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from strawberry.fastapi import BaseContext
+from strawberry.types import Info as _Info
+from strawberry.types.info import RootValueType
+from app.db.purge import deletion_state
+from app.utils.deletions_utils import DeletableType, DeletionJob, DeletionStatus, RemainingRows
+from app.security.validation import require_admin
+
+Info = _Info[BaseContext, RootValueType]
+
+
+@strawberry.type
+class DeletionQuery:
+    @strawberry.field
+    async def deletion_job(self, info: Info, entity_type: DeletableType, entity_id: int) -> DeletionJob:
+        require_admin(info)
+        # Derived from the database, so any worker can answer for a purge running in another
+        try:
+            state = await run_in_threadpool(deletion_state, entity_type.value, entity_id)
+        except LookupError:
+            raise HTTPException(status_code=404, detail=f"{entity_type.name.capitalize()} not found")
+        if state is None:
+            return DeletionJob(entity_type=entity_type, entity_id=entity_id, status=DeletionStatus.DONE)
+
+        deleted_at, remaining = state
+        status = DeletionStatus.NOT_DELETED if deleted_at is None else DeletionStatus.PURGING
+        return DeletionJob(entity_type=entity_type, entity_id=entity_id, status=status, deleted_at=deleted_at,
+                           remaining=[RemainingRows(table=table, rows=rows) for table, rows in remaining.items()])
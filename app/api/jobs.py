@@ -0,0 +1,54 @@
+import strawberry
+import typing
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from strawberry.fastapi import BaseContext
+from strawberry.types import Info as _Info
+from strawberry.types.info import RootValueType
+from app.jobs.runner import HANDLERS, INTERNAL_KINDS, enqueue, job_runner
+from app.jobs.store import get_job, list_jobs, requeue_failed_job
+from app.utils.jobs_utils import Job, JobInput, JobResponse, JobStatus
+from app.security.validation import require_admin
+
+Info = _Info[BaseContext, RootValueType]
+
+
+def to_job(row: dict) -> Job:
+    return Job(**{**row, "status": JobStatus(row["status"])})
+
+
+@strawberry.type
+class JobQuery:
+    @strawberry.field
+    async def job(self, info: Info, job_id: int) -> Job:
+        require_admin(info)
+        row = await run_in_threadpool(get_job, job_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return to_job(row)
+
+    @strawberry.field
+    async def jobs(self, info: Info, status: typing.Optional[JobStatus] = None, limit: int = 50) -> typing.List[Job]:
+        require_admin(info)
+        rows = await run_in_threadpool(list_jobs, status.value if status else None, min(limit, 500))
+        return [to_job(row) for row in rows]
+
+
+@strawberry.type
+class JobMutation:
+    @strawberry.mutation
+    def enqueue_job(self, info: Info, job: JobInput) -> JobResponse:
+        require_admin(info)
+        if job.kind not in HANDLERS or job.kind in INTERNAL_KINDS:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind {job.kind}")
+        row = enqueue(job.kind, job.payload, job_key=job.job_key, run_at=job.run_at, max_attempts=job.max_attempts)
+        return JobResponse(success=True, message=f"Job {row['job_id']} queued", job=to_job(row))
+
+    @strawberry.mutation
+    def retry_job(self, info: Info, job_id: int) -> JobResponse:
+        require_admin(info)
+        row = requeue_failed_job(job_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Failed job not found")
+        job_runner.wake()
+        return JobResponse(success=True, message=f"Job {job_id} queued", job=to_job(row))
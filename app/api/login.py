@@ -1,17 +1,67 @@
 import strawberry
 from fastapi import HTTPException, status
-from app.security.hash import verify_password
-from app.security.token import create_access_token
-from app.security.validation import get_user_by_email
-from app.utils.login_utils import Login, LoginResponse
+from starlette.concurrency import run_in_threadpool
+from strawberry.fastapi import BaseContext
+from strawberry.types import Info as _Info
+from strawberry.types.info import RootValueType
+from app.security.hash import verify_password, dummy_verify_password
+from app.security.rate_limit import check_login_rate
+from app.security.token import (create_access_token, create_refresh_token, decode_token, revoke_token,
+                                REFRESH_TOKEN)
+from app.security.validation import get_user_by_email, known_emails
+from app.settings import get_settings
+from app.utils.login_utils import Login, LoginResponse, LogoutResponse
+
+Info = _Info[BaseContext, RootValueType]
+
+
+def issue_tokens(user_id) -> LoginResponse:
+    return LoginResponse(success=True, message="Login successfully",
+                         token=create_access_token(data={"sub": user_id}),
+                         refresh_token=create_refresh_token(data={"sub": user_id}))
+
+
+def authenticate(ip: str, email: str, password: str) -> LoginResponse:
+    # Throttled callers are rejected before any database or bcrypt work
+    check_login_rate(ip, email)
+
+    if get_settings().login_known_emails_only and email not in known_emails:
+        user = None
+    else:
+        user = get_user_by_email(email)
+
+    if not user:
+        dummy_verify_password(password)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    if not verify_password(password, user.password):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    return issue_tokens(user.user_id)
 
 
 @strawberry.type
 class LoginMutation:
     @strawberry.mutation
-    def login(self, login: Login) -> LoginResponse:
-        user = get_user_by_email(login.email)
-        if not user or not verify_password(login.password, user.password):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-        access_token = create_access_token(data={"sub": user.user_id})
-        return LoginResponse(success=True, message="Login successfully", token=access_token)
+    async def login(self, info: Info, login: Login) -> LoginResponse:
+        # Emails are matched case-insensitively, by the rate limiter as well as the lookups
+        client = info.context["request"].client
+        return await run_in_threadpool(authenticate, client.host if client else "unknown",
+                                       login.email.strip().lower(), login.password)
+
+    @strawberry.mutation
+    def refresh_token(self, refresh_token: str) -> LoginResponse:
+        payload = decode_token(refresh_token, REFRESH_TOKEN)
+        if payload is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not valid token or token expired")
+        # Refresh tokens are single use: a new pair is only issued by the call that revoked it
+        if not revoke_token(refresh_token, REFRESH_TOKEN):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not valid token or token expired")
+        return issue_tokens(payload["sub"])
+
+    @strawberry.mutation
+    def logout(self, info: Info, refresh_token: str = "") -> LogoutResponse:
+        token = info.context["request"].headers.get("authorization", "")
+        if not revoke_token(token):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not valid token or token expired")
+        if refresh_token:
+            revoke_token(refresh_token, REFRESH_TOKEN)
+        return LogoutResponse(success=True, message="Logout successfully")
@@ -0,0 +1,204 @@
+import json
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app.db.config import connection_kwargs, get_database_connection
+from app.db.statements import execute, register
+from app.metrics import metrics
+from app.settings import get_settings
+from app.utils.catalog_utils import Role, UserSummary
+
+CHANNEL = "catalog"
+
+register("catalog_roles", "SELECT role_id, role, role_description FROM roles")
+register("catalog_users", "SELECT user_id, username, name, role_id FROM users WHERE deleted_at IS NULL")
+register("catalog_revoked_tokens", "SELECT jti, EXTRACT(EPOCH FROM expires_at)::float8 FROM revoked_tokens"
+                                   " WHERE expires_at > clock_timestamp()")
+
+
+def catalog_notifications():
+    # Every change to users or roles, and every revoked token, is published on the catalog
+    # channel with the new row (minus credentials), so listeners can apply it without
+    # querying back
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION public.notify_catalog() RETURNS trigger AS $$
+            DECLARE
+                row_data jsonb;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    row_data := to_jsonb(OLD);
+                ELSIF TG_OP <> 'TRUNCATE' THEN
+                    row_data := to_jsonb(NEW);
+                END IF;
+                PERFORM pg_notify('{CHANNEL}', json_build_object(
+                    'table', TG_TABLE_NAME, 'op', TG_OP, 'row', row_data - ARRAY['password', 'email'])::text);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+        for table in ("users", "roles"):
+            cursor.execute(f"""
+                DROP TRIGGER IF EXISTS tr_{table}_catalog ON public.{table};
+                CREATE TRIGGER tr_{table}_catalog
+                AFTER INSERT OR UPDATE OR DELETE ON public.{table}
+                FOR EACH ROW EXECUTE FUNCTION public.notify_catalog();
+
+                DROP TRIGGER IF EXISTS tr_{table}_catalog_truncate ON public.{table};
+                CREATE TRIGGER tr_{table}_catalog_truncate
+                AFTER TRUNCATE ON public.{table}
+                FOR EACH STATEMENT EXECUTE FUNCTION public.notify_catalog();
+            """)
+        cursor.execute("""
+            DROP TRIGGER IF EXISTS tr_revoked_tokens_catalog ON public.revoked_tokens;
+            CREATE TRIGGER tr_revoked_tokens_catalog
+            AFTER INSERT ON public.revoked_tokens
+            FOR EACH ROW EXECUTE FUNCTION public.notify_catalog();
+        """)
+
+
+class Catalog:
+    # Per-worker copy of the roles, of a summary of every live user and of the ids (jti)
+    # of revoked tokens that have not expired yet. Loaded when the worker starts, then kept current by a thread listening on the catalog channel.
+    # Lookups never do I/O; while the listener is disconnected `live` is False and
+    # callers that need fresh data (role checks) go to the database instead.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles = {}
+        self._users = {}
+        self._revoked = {}
+        self._live = threading.Event()
+        self._loaded = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def live(self) -> bool:
+        return self._live.is_set()
+
+    @property
+    def loaded(self) -> bool:
+        # Loaded at least once, possibly stale while the listener reconnects
+        return self._loaded.is_set()
+
+    def role(self, role_id: int) -> Optional[Role]:
+        return self._roles.get(role_id)
+
+    def roles(self) -> list:
+        with self._lock:
+            return sorted(self._roles.values(), key=lambda role: role.role_id)
+
+    def user(self, user_id: int) -> Optional[UserSummary]:
+        return self._users.get(user_id)
+
+    def role_of(self, user_id: int) -> Optional[int]:
+        user = self._users.get(user_id)
+        return user.role_id if user else None
+
+    def revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def start(self):
+        if self._thread:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name="catalog-listener", daemon=True)
+        self._thread.start()
+        # Serve the first requests from memory when the database answers in time
+        self._live.wait(get_settings().db_connect_timeout)
+
+    def stop(self, timeout: float = 5):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _load(self, cursor):
+        execute(cursor, "catalog_roles")
+        roles = {row[0]: Role(role_id=row[0], role=row[1], role_description=row[2]) for row in cursor.fetchall()}
+        execute(cursor, "catalog_users")
+        users = {row[0]: UserSummary(user_id=row[0], username=row[1], name=row[2], role_id=row[3])
+                 for row in cursor.fetchall()}
+        execute(cursor, "catalog_revoked_tokens")
+        revoked = dict(cursor.fetchall())
+        with self._lock:
+            self._roles, self._users, self._revoked = roles, users, revoked
+        self._loaded.set()
+        metrics.inc("catalog_reloads_total")
+
+    def _apply(self, cursor, change: dict):
+        metrics.inc("catalog_notifications_total", table=change["table"])
+        row = change["row"]
+        if change["op"] == "TRUNCATE":
+            self._load(cursor)
+        elif change["table"] == "roles":
+            with self._lock:
+                if change["op"] == "DELETE":
+                    self._roles.pop(row["role_id"], None)
+                else:
+                    self._roles[row["role_id"]] = Role(role_id=row["role_id"], role=row["role"],
+                                                       role_description=row["role_description"])
+        elif change["table"] == "users":
+            with self._lock:
+                if change["op"] == "DELETE" or row.get("deleted_at") is not None:
+                    self._users.pop(row["user_id"], None)
+                else:
+                    self._users[row["user_id"]] = UserSummary(user_id=row["user_id"], username=row["username"],
+                                                              name=row["name"], role_id=row["role_id"])
+        elif change["table"] == "revoked_tokens":
+            expires_at = datetime.fromisoformat(row["expires_at"]).timestamp()
+            now = time.time()
+            with self._lock:
+                self._revoked[row["jti"]] = expires_at
+                for jti in [jti for jti, expiry in self._revoked.items() if expiry <= now]:
+                    del self._revoked[jti]
+
+    def _listen(self):
+        settings = get_settings()
+        while not self._stopping.is_set():
+            keepalive = settings.catalog_keepalive_seconds
+            try:
+                # An idle LISTEN connection would not notice a dead peer on its own
+                connection = psycopg2.connect(**connection_kwargs(), keepalives=1, keepalives_idle=keepalive,
+                                              keepalives_interval=keepalive, keepalives_count=3,
+                                              tcp_user_timeout=keepalive * 3 * 1000)
+            except psycopg2.Error as e:
+                print(f"Error al conectar el catálogo: {e}")
+                self._stopping.wait(settings.catalog_retry_seconds)
+                continue
+            try:
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    # LISTEN before loading: changes committed during the load are queued
+                    # and replayed on top of it, and replaying a row twice is harmless
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                    self._load(cursor)
+                    self._live.set()
+                    heartbeat = time.monotonic()
+                    while not self._stopping.is_set():
+                        if select.select([connection], [], [], 1)[0]:
+                            connection.poll()
+                            while connection.notifies:
+                                self._apply(cursor, json.loads(connection.notifies.pop(0).payload))
+                        elif time.monotonic() - heartbeat > settings.catalog_heartbeat_seconds:
+                            # A dead connection only shows up when it is used. Until the
+                            # heartbeat answers, callers must not trust the catalog.
+                            self._live.clear()
+                            cursor.execute("SELECT 1")
+                            self._live.set()
+                            heartbeat = time.monotonic()
+            except psycopg2.Error as e:
+                print(f"Error en el catálogo: {e}")
+            finally:
+                self._live.clear()
+                connection.close()
+            self._stopping.wait(settings.catalog_retry_seconds)
+
+
+catalog = Catalog()
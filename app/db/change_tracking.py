@@ -0,0 +1,96 @@
+from app.db.config import get_database_connection
+from app.db.tables import TABLES
+from app.settings import get_settings
+
+
+def change_tracking():
+    owner = get_settings().db_user
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.tombstones (
+                entity_type character varying(50) NOT NULL,
+                entity_id integer NOT NULL,
+                deleted_at timestamp with time zone NOT NULL,
+                CONSTRAINT pk_tombstone PRIMARY KEY (entity_type, entity_id)
+            );
+
+            ALTER TABLE IF EXISTS public.tombstones
+            ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+            DROP INDEX IF EXISTS public.ix_tombstones_deleted_at;
+            CREATE INDEX IF NOT EXISTS ix_tombstones_change_xid
+            ON public.tombstones (entity_type, change_xid, entity_id);
+
+            CREATE INDEX IF NOT EXISTS ix_tombstones_retention
+            ON public.tombstones (deleted_at);
+
+            ALTER TABLE IF EXISTS public.tombstones
+            OWNER to {owner};
+
+            -- change_xid below which tombstones have been pruned, see prune_tombstones()
+            CREATE TABLE IF NOT EXISTS public.tombstone_horizon (
+                singleton boolean NOT NULL DEFAULT true,
+                pruned_xid xid8 NOT NULL,
+                CONSTRAINT pk_tombstone_horizon PRIMARY KEY (singleton),
+                CONSTRAINT ck_tombstone_horizon_singleton CHECK (singleton)
+            );
+
+            INSERT INTO public.tombstone_horizon (pruned_xid) VALUES ('0')
+            ON CONFLICT (singleton) DO NOTHING;
+
+            ALTER TABLE IF EXISTS public.tombstone_horizon
+            OWNER to {owner};
+        """)
+
+        # Sync windows follow commit order, not time: every write stamps change_xid with
+        # the id of its transaction, and changes() only hands out rows from transactions
+        # below the snapshot xmin, which have all finished (see app/db/changes.py).
+        # Triggers on a partitioned table fire with the partition as TG_TABLE_NAME, so the
+        # entity type is passed in as the second argument.
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION public.touch_row() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := clock_timestamp();
+                NEW.version := OLD.version + 1;
+                NEW.change_xid := pg_current_xact_id();
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION public.record_tombstone() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO public.tombstones (entity_type, entity_id, deleted_at, change_xid)
+                VALUES (COALESCE(TG_ARGV[1], TG_TABLE_NAME), (to_jsonb(OLD) ->> TG_ARGV[0])::integer, clock_timestamp(),
+                        pg_current_xact_id())
+                ON CONFLICT (entity_type, entity_id)
+                DO UPDATE SET deleted_at = EXCLUDED.deleted_at, change_xid = EXCLUDED.change_xid;
+                RETURN OLD;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+
+        for table in TABLES:
+            if not table.track_changes:
+                continue
+            # Only writes to the columns clients see move updated_at/version; bookkeeping
+            # such as soft deletes or reminder markers does not show up as a change
+            cursor.execute(f"""
+                ALTER TABLE IF EXISTS public.{table.name}
+                ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
+                ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1,
+                ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+                DROP INDEX IF EXISTS public.ix_{table.name}_updated_at;
+                CREATE INDEX IF NOT EXISTS ix_{table.name}_change_xid
+                ON public.{table.name} (change_xid, {table.key});
+
+                DROP TRIGGER IF EXISTS tr_{table.name}_touch ON public.{table.name};
+                CREATE TRIGGER tr_{table.name}_touch
+                BEFORE UPDATE OF {', '.join(column.name for column in table.data_columns)} ON public.{table.name}
+                FOR EACH ROW EXECUTE FUNCTION public.touch_row();
+
+                DROP TRIGGER IF EXISTS tr_{table.name}_tombstone ON public.{table.name};
+                CREATE TRIGGER tr_{table.name}_tombstone
+                AFTER DELETE ON public.{table.name}
+                FOR EACH ROW EXECUTE FUNCTION public.record_tombstone('{table.key}', '{table.name}');
+            """)
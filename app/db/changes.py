@@ -0,0 +1,64 @@
+import time
+
+from app.db.config import get_database_connection
+from app.db.statements import execute, register
+from app.jobs.runner import DAY, register_handler, schedule_recurring
+from app.settings import get_settings
+
+# Upper bound of a sync window: every transaction below the snapshot xmin has finished,
+# so rows stamped with a change_xid under it can no longer appear behind the cursor.
+# Transactions still running are left for the next sync.
+register("sync_watermark", "SELECT pg_snapshot_xmin(pg_current_snapshot())")
+register("tombstones_since", "SELECT entity_type, entity_id, deleted_at FROM tombstones"
+                             " WHERE entity_type = ANY($1) AND change_xid >= $2 AND change_xid < $3"
+                             " ORDER BY change_xid, entity_id")
+register("tombstone_horizon", "SELECT pruned_xid FROM tombstone_horizon")
+# Cursors at or below the horizon may have missed pruned tombstones
+register("prune_tombstones", "WITH pruned AS (DELETE FROM tombstones WHERE ctid = ANY(ARRAY("
+                             "SELECT ctid FROM tombstones WHERE deleted_at < clock_timestamp() - make_interval(days => $1)"
+                             " LIMIT $2)) RETURNING change_xid)"
+                             " UPDATE tombstone_horizon SET pruned_xid = GREATEST(pruned_xid,"
+                             " (SELECT max(change_xid) FROM pruned)) RETURNING (SELECT count(*) FROM pruned)")
+
+
+def sync_watermark() -> int:
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, "sync_watermark")
+        return int(cursor.fetchone()[0])
+
+
+def tombstone_horizon() -> int:
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, "tombstone_horizon")
+        return int(cursor.fetchone()[0])
+
+
+def tombstones_since(entity_types: list, since: int, until: int) -> list:
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, "tombstones_since", (entity_types, str(since), str(until)))
+        return cursor.fetchall()
+
+
+def prune_tombstones(job) -> dict:
+    # Daily job: drops tombstones older than TOMBSTONE_RETENTION_DAYS in batches and moves
+    # the horizon past them
+    settings = get_settings()
+    schedule_tombstone_pruning(ahead=1)
+    deleted = 0
+    while True:
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, "prune_tombstones", (settings.tombstone_retention_days, settings.purge_batch_size))
+            count = cursor.fetchone()[0]
+        deleted += count
+        if count == 0:
+            return {"deleted": deleted}
+        job.progress(deleted=deleted)
+        job.check_stopping()
+        time.sleep(settings.purge_batch_pause_ms / 1000)
+
+
+register_handler("prune_tombstones", prune_tombstones)
+
+
+def schedule_tombstone_pruning(ahead: int = 0):
+    schedule_recurring("prune_tombstones", DAY, ahead)
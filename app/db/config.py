@@ -1,27 +1,222 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+from fastapi import HTTPException
+from psycopg2 import pool
+from psycopg2.errors import QueryCanceled
+
+from app.db.statements import PreparedConnection
+from app.settings import get_settings
+
+_pool = None
+_pool_lock = threading.Lock()
+# One permit per pooled connection: getconn() fails at once when the pool is empty, so
+# checkouts wait here for a free connection instead
+_pool_slots = None
+# (connection, lock) shared by everything running in the current context, see shared_connection()
+_shared_connection = contextvars.ContextVar("shared_connection", default=None)
+# statement_timeout (ms) for transactions opened in the current context, see statement_timeout()
+_statement_timeout = contextvars.ContextVar("statement_timeout", default=None)
+# ConnectionTracker of the request running in the current context
+_connection_tracker = contextvars.ContextVar("connection_tracker", default=None)
 
 
-def get_database_connection():
-    return psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="postgres",
-        host="db",
-        port="5432"
+def connection_kwargs() -> dict:
+    settings = get_settings()
+    return dict(
+        dbname=settings.db_name,
+        user=settings.db_user,
+        password=settings.db_password,
+        host=settings.db_host,
+        port=settings.db_port,
+        connect_timeout=settings.db_connect_timeout,
+        options=f"-c statement_timeout={settings.db_statement_timeout_ms}",
+        connection_factory=PreparedConnection
     )
 
 
+def init_pool():
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            settings = get_settings()
+            _pool_slots = threading.BoundedSemaphore(settings.db_pool_max_size)
+            _pool = pool.ThreadedConnectionPool(settings.db_pool_min_size, settings.db_pool_max_size,
+                                                **connection_kwargs())
+    return _pool
+
+
+def warm_pool():
+    connection_pool = init_pool()
+    connections = [connection_pool.getconn() for _ in range(get_settings().db_pool_min_size)]
+    try:
+        for connection in connections:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            connection.rollback()
+    finally:
+        for connection in connections:
+            connection_pool.putconn(connection)
+
+
+def pool_ready() -> bool:
+    return _pool is not None and not _pool.closed
+
+
+def close_pool():
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _pool_slots = None
+
+
+class ConnectionTracker:
+    # Connections checked out on behalf of one request, so that its running queries can be
+    # cancelled when the client goes away. The lock keeps cancel() from reaching a
+    # connection that has already gone back to the pool.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = set()
+        self.cancelled = False
+
+    def add(self, connection) -> bool:
+        # False once cancelled: the request must not start new queries
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._connections.add(connection)
+            return True
+
+    def discard(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for connection in self._connections:
+                try:
+                    connection.cancel()
+                except psycopg2.Error as e:
+                    print(f"Error al cancelar la consulta: {e}")
+
+
+@contextmanager
+def track_connections(tracker: ConnectionTracker):
+    token = _connection_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _connection_tracker.reset(token)
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    # Overrides the session statement_timeout with SET LOCAL in every transaction opened
+    # inside the block; None keeps the session default
+    token = _statement_timeout.set(milliseconds)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+
+@contextmanager
+def _transaction(connection):
+    timeout = _statement_timeout.get()
+    try:
+        if timeout is not None:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (timeout,))
+        yield connection
+        connection.commit()
+    except BaseException:
+        if not connection.closed:
+            connection.rollback()
+        raise
+
+
+@contextmanager
+def _pooled_connection():
+    # A cancelled request fails the way its running queries did
+    tracker = _connection_tracker.get()
+    if tracker is not None and tracker.cancelled:
+        raise QueryCanceled("Request cancelled")
+    connection_pool = _pool or init_pool()
+    slots = _pool_slots
+    if not slots.acquire(timeout=get_settings().db_pool_wait_ms / 1000):
+        raise HTTPException(status_code=503, detail="Database busy, retry later")
+    try:
+        connection = connection_pool.getconn()
+    except BaseException:
+        slots.release()
+        raise
+    if tracker is not None and not tracker.add(connection):
+        connection_pool.putconn(connection)
+        slots.release()
+        raise QueryCanceled("Request cancelled")
+    try:
+        # A cancelled query fails its transaction, which is rolled back here, so the
+        # connection always goes back to the pool idle
+        with _transaction(connection):
+            yield connection
+    finally:
+        if tracker is not None:
+            tracker.discard(connection)
+        connection_pool.putconn(connection)
+        slots.release()
+
+
+@contextmanager
+def shared_connection():
+    # Checks out one pooled connection for everything that runs inside the block (and in
+    # tasks or threads started from it), e.g. all operations of a batched request. Users
+    # take turns on it; each get_database_connection() block is still its own transaction.
+    with _pooled_connection() as connection:
+        token = _shared_connection.set((connection, threading.Lock()))
+        try:
+            yield connection
+        finally:
+            _shared_connection.reset(token)
+
+
+@contextmanager
+def get_database_connection(dedicated: bool = False):
+    shared = None if dedicated else _shared_connection.get()
+    if shared is None:
+        with _pooled_connection() as connection:
+            yield connection
+        return
+
+    connection, lock = shared
+    with lock, _transaction(connection):
+        yield connection
+
+
 def config_database():
     try:
         from app.db.create_tables import create_tables
         from app.db.config_tables import foreign_keys
         from app.db.create_roles import create_roles
+        from app.db.change_tracking import change_tracking
+        from app.db.soft_deletes import soft_deletes
+        from app.db.partitions import partition_comments
+        from app.db.catalog import catalog_notifications
+        from app.db.deadlines import deadline_tracking
 
         create_tables()
+        partition_comments()
         foreign_keys()
         create_roles()
+        catalog_notifications()
+        change_tracking()
+        soft_deletes()
+        deadline_tracking()
     except ImportError as import_error:
         print(f"Error de importación: {import_error}")
     except Exception as e:
         print(f"Error no especificado: {e}")
-
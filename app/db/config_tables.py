@@ -10,29 +10,31 @@ def check_constraint(cursor, constraint_name):
     return not cursor.fetchone()
 
 
+def is_partitioned(cursor, table_name):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (f"public.{table_name}",))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
 def add_foreign_key(cursor, constraint_name, table_name, column_name, reference_table, reference_column):
     if check_constraint(cursor, constraint_name):
+        # Partitioned tables do not accept NOT VALID foreign keys; they are checked right away
+        not_valid = "" if is_partitioned(cursor, table_name) else "NOT VALID"
         cursor.execute(f"""
             ALTER TABLE IF EXISTS public.{table_name}
             ADD CONSTRAINT {constraint_name} FOREIGN KEY ({column_name})
             REFERENCES public.{reference_table} ({reference_column}) MATCH SIMPLE
             ON UPDATE CASCADE
             ON DELETE CASCADE
-            NOT VALID;
+            {not_valid};
         """)
 
 
 def foreign_keys():
-    connection = get_database_connection()
-    cursor = connection.cursor()
-
-    add_foreign_key(cursor, 'fk_user_role', 'users', 'role_id', 'roles', 'role_id')
-    add_foreign_key(cursor, 'fk_responsible_user', 'projects', 'responsible_id', 'users', 'user_id')
-    add_foreign_key(cursor, 'fk_project_task', 'tasks', 'project_id', 'projects', 'project_id')
-    add_foreign_key(cursor, 'fk_responsible_task', 'tasks', 'responsible_id', 'users', 'user_id')
-    add_foreign_key(cursor, 'fk_user_comment', 'comments', 'user_id', 'users', 'user_id')
-    add_foreign_key(cursor, 'fk_project_comment', 'comments', 'project_id', 'projects', 'project_id')
-
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        add_foreign_key(cursor, 'fk_user_role', 'users', 'role_id', 'roles', 'role_id')
+        add_foreign_key(cursor, 'fk_responsible_user', 'projects', 'responsible_id', 'users', 'user_id')
+        add_foreign_key(cursor, 'fk_project_task', 'tasks', 'project_id', 'projects', 'project_id')
+        add_foreign_key(cursor, 'fk_responsible_task', 'tasks', 'responsible_id', 'users', 'user_id')
+        add_foreign_key(cursor, 'fk_user_comment', 'comments', 'user_id', 'users', 'user_id')
+        add_foreign_key(cursor, 'fk_project_comment', 'comments', 'project_id', 'projects', 'project_id')
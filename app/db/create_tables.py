@@ -1,82 +1,140 @@
 from app.db.config import get_database_connection
+from app.settings import get_settings
 
 
 def create_tables():
-    connection = get_database_connection()
-    cursor = connection.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS public.users (
-            user_id serial,
-            username character varying(50) NOT NULL,
-            password character varying(100) NOT NULL,
-            email character varying(50) NOT NULL,
-            name character varying(50) NOT NULL,
-            role_id integer NOT NULL,
-            CONSTRAINT pk_user PRIMARY KEY (user_id)
-        );
-
-        ALTER TABLE IF EXISTS public.users
-        OWNER to postgres;
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS public.roles (
-            role_id serial,
-            role character varying(50) NOT NULL,
-            role_description character varying(255) NOT NULL,
-            CONSTRAINT pk_role PRIMARY KEY (role_id)
-        );
-
-        ALTER TABLE IF EXISTS public.roles
-        OWNER to postgres;   
+    owner = get_settings().db_user
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.users (
+                user_id serial,
+                username character varying(50) NOT NULL,
+                password character varying(100) NOT NULL,
+                email character varying(50) NOT NULL,
+                name character varying(50) NOT NULL,
+                role_id integer NOT NULL,
+                CONSTRAINT pk_user PRIMARY KEY (user_id)
+            );
+
+            ALTER TABLE IF EXISTS public.users
+            OWNER to {owner};
         """)
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS public.projects (
-            project_id serial,
-            project_name character varying(100) NOT NULL,
-            project_description character varying(255) NOT NULL,
-            start_date date NOT NULL,
-            end_date date,
-            responsible_id integer,
-            CONSTRAINT pk_project PRIMARY KEY (project_id)
-        );
-
-        ALTER TABLE IF EXISTS public.projects
-        OWNER to postgres;
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS public.tasks (
-            task_id serial,
-            task_name character varying(50) NOT NULL,
-            task_description character varying(255) NOT NULL,
-            deadline date,
-            task_status character varying(50) NOT NULL,
-            project_id integer NOT NULL,
-            responsible_id integer NOT NULL,
-            CONSTRAINT pk_task PRIMARY KEY (task_id)
-        );
-
-        ALTER TABLE IF EXISTS public.tasks
-        OWNER to postgres;
-    """)
-
-    cursor.execute("""
-         CREATE TABLE IF NOT EXISTS public.comments (
-            comment_id serial,
-            comment_content character varying(255) NOT NULL,
-            creation_date date NOT NULL,
-            user_id integer NOT NULL,
-            project_id integer NOT NULL,
-            CONSTRAINT pk_comment PRIMARY KEY (comment_id)
-        );
-
-        ALTER TABLE IF EXISTS public.comments
-        OWNER to postgres;
-    """)
-
-    connection.commit()
-    cursor.close()
-    connection.close()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.roles (
+                role_id serial,
+                role character varying(50) NOT NULL,
+                role_description character varying(255) NOT NULL,
+                CONSTRAINT pk_role PRIMARY KEY (role_id)
+            );
+
+            ALTER TABLE IF EXISTS public.roles
+            OWNER to {owner};   
+            """)
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.projects (
+                project_id serial,
+                project_name character varying(100) NOT NULL,
+                project_description character varying(255) NOT NULL,
+                start_date date NOT NULL,
+                end_date date,
+                responsible_id integer,
+                CONSTRAINT pk_project PRIMARY KEY (project_id)
+            );
+
+            ALTER TABLE IF EXISTS public.projects
+            OWNER to {owner};
+        """)
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.tasks (
+                task_id serial,
+                task_name character varying(50) NOT NULL,
+                task_description character varying(255) NOT NULL,
+                deadline date,
+                task_status character varying(50) NOT NULL,
+                project_id integer NOT NULL,
+                responsible_id integer NOT NULL,
+                CONSTRAINT pk_task PRIMARY KEY (task_id)
+            );
+
+            ALTER TABLE IF EXISTS public.tasks
+            OWNER to {owner};
+        """)
+
+        cursor.execute(f"""
+             CREATE TABLE IF NOT EXISTS public.comments (
+                comment_id serial,
+                comment_content character varying(255) NOT NULL,
+                creation_date date NOT NULL,
+                user_id integer NOT NULL,
+                project_id integer NOT NULL,
+                CONSTRAINT pk_comment PRIMARY KEY (comment_id, creation_date)
+            ) PARTITION BY RANGE (creation_date);
+
+            ALTER TABLE IF EXISTS public.comments
+            OWNER to {owner};
+        """)
+
+        cursor.execute(f"""
+            CREATE UNLOGGED TABLE IF NOT EXISTS public.rate_limit_buckets (
+                bucket_key character varying(255) NOT NULL,
+                tokens double precision NOT NULL,
+                updated_at timestamp with time zone NOT NULL,
+                CONSTRAINT pk_rate_limit_bucket PRIMARY KEY (bucket_key)
+            );
+
+            ALTER TABLE IF EXISTS public.rate_limit_buckets
+            OWNER to {owner};
+        """)
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.jobs (
+                job_id bigserial,
+                kind character varying(50) NOT NULL,
+                payload jsonb NOT NULL DEFAULT '{{}}',
+                job_key character varying(255),
+                status character varying(20) NOT NULL DEFAULT 'queued',
+                attempts integer NOT NULL DEFAULT 0,
+                max_attempts integer NOT NULL,
+                run_at timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
+                locked_at timestamp with time zone,
+                locked_by character varying(255),
+                progress jsonb,
+                result jsonb,
+                last_error text,
+                created_at timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
+                finished_at timestamp with time zone,
+                CONSTRAINT pk_job PRIMARY KEY (job_id)
+            );
+
+            CREATE INDEX IF NOT EXISTS ix_jobs_claim
+            ON public.jobs (run_at, job_id) WHERE status = 'queued';
+
+            CREATE INDEX IF NOT EXISTS ix_jobs_running
+            ON public.jobs (locked_at) WHERE status = 'running';
+
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_active_key
+            ON public.jobs (job_key) WHERE status IN ('queued', 'running');
+
+            CREATE INDEX IF NOT EXISTS ix_jobs_key
+            ON public.jobs (job_key);
+
+            ALTER TABLE IF EXISTS public.jobs
+            OWNER to {owner};
+        """)
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public.revoked_tokens (
+                jti character varying(64) NOT NULL,
+                expires_at timestamp with time zone NOT NULL,
+                CONSTRAINT pk_revoked_token PRIMARY KEY (jti)
+            );
+
+            CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at
+            ON public.revoked_tokens (expires_at);
+
+            ALTER TABLE IF EXISTS public.revoked_tokens
+            OWNER to {owner};
+        """)
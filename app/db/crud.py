@@ -0,0 +1,177 @@
+from fastapi import HTTPException
+from psycopg2 import IntegrityError
+
+from app.db.config import get_database_connection
+from app.db.rows import make_row_factory
+from app.db.statements import STATEMENTS, execute, register
+from app.db.tables import Table
+
+
+class RowStream:
+    # Server-side cursor over a table; holds its pooled connection until close()
+    def __init__(self, sql: str, to_object, itersize: int, params: tuple = ()):
+        # Named cursors live until the transaction ends, so never share this connection
+        self._connection_context = get_database_connection(dedicated=True)
+        connection = self._connection_context.__enter__()
+        try:
+            self.cursor = connection.cursor(name=f"row_stream_{id(self)}")
+            self.cursor.itersize = itersize
+            self.cursor.execute(sql, params)
+        except BaseException as e:
+            self._connection_context.__exit__(type(e), e, e.__traceback__)
+            raise
+        self.to_object = to_object
+
+    def take(self, count: int) -> list:
+        return list(map(self.to_object, self.cursor.fetchmany(count)))
+
+    def close(self):
+        try:
+            self.cursor.close()
+        finally:
+            self._connection_context.__exit__(None, None, None)
+
+
+class Crud:
+    # Data access for one table. The SQL is generated once from the table metadata and
+    # registered as prepared statements named <table>_by_id, <table>_all, ...
+    def __init__(self, table: Table):
+        self.table = table
+        converters = [(index, column.from_db) for index, column in enumerate(table.columns) if column.from_db]
+        self.to_object = make_row_factory(table.type, table.column_names, converters)
+
+        name, key = table.name, table.key
+        columns = ", ".join(table.column_names)
+        data_columns = [column.name for column in table.data_columns]
+        placeholders = ", ".join(f"COALESCE(${index}, {column.default})" if column.default else f"${index}"
+                                 for index, column in enumerate(table.data_columns, start=1))
+        # The partition key is fixed at insert: changing it would move the row to another
+        # partition, which runs as a delete plus insert and leaves a tombstone behind
+        self._updatable = [column for column in table.data_columns if column.name != table.partition_key]
+        # Unset fields are passed as NULL and keep their value through COALESCE, so
+        # every partial update shares one statement
+        assignments = ", ".join(f"{column.name} = COALESCE(${index}, {column.name})"
+                                for index, column in enumerate(self._updatable, start=2))
+        conditions = table.live_conditions
+        live = "".join(f" AND {condition}" for condition in conditions)
+
+        self._by_id = f"{name}_by_id"
+        self._by_ids = f"{name}_by_ids"
+        self._all = f"{name}_all"
+        self._insert = f"{name}_insert"
+        self._update = f"{name}_update"
+        self._delete = f"{name}_delete"
+
+        register(self._by_id, f"SELECT {columns} FROM {name} WHERE {key} = $1{live}")
+        register(self._by_ids, f"SELECT {columns} FROM {name} WHERE {key} = ANY($1){live}")
+        register(self._all, f"SELECT {columns} FROM {name}" + (f" WHERE {' AND '.join(conditions)}" if conditions else ""))
+        register(self._insert, f"INSERT INTO {name} ({', '.join(data_columns)}) VALUES ({placeholders})"
+                               f" RETURNING {columns}")
+        register(self._update, f"UPDATE {name} SET {assignments} WHERE {key} = $1{live} RETURNING {columns}")
+        if table.soft_delete:
+            register(self._delete, f"UPDATE {name} SET deleted_at = clock_timestamp() WHERE {key} = $1{live}")
+        else:
+            register(self._delete, f"DELETE FROM {name} WHERE {key} = $1")
+        if table.partition_key:
+            # Lookups that also filter on the partition key only touch the matching partitions
+            self._by_id_in = f"{name}_by_id_in"
+            self._since = f"{name}_since"
+            register(self._by_id_in, f"SELECT {columns} FROM {name} WHERE {key} = $1"
+                                     f" AND {table.partition_key} = $2{live}")
+            register(self._since, f"SELECT {columns} FROM {name} WHERE {table.partition_key} >= $1{live}")
+        if table.track_changes:
+            self._changed = f"{name}_changed"
+            # Served by the (change_xid, key) index created in change_tracking.py
+            register(self._changed, f"SELECT {columns} FROM {name} WHERE change_xid >= $1 AND change_xid < $2{live}"
+                                    f" ORDER BY change_xid, {key}")
+
+    def _not_found(self):
+        return HTTPException(status_code=404, detail=f"{self.table.label} not found")
+
+    def _values(self, data, columns: list) -> list:
+        values = []
+        for column in columns:
+            value = getattr(data, column.name, None)
+            if value is not None and column.to_db:
+                value = column.to_db(value)
+            values.append(value)
+        return values
+
+    def _write(self, action: str, statement: str, params: tuple):
+        try:
+            with get_database_connection() as connection, connection.cursor() as cursor:
+                execute(cursor, statement, params)
+                return cursor.fetchone() if cursor.description else cursor.rowcount
+        except IntegrityError as e:
+            if "unique constraint" in str(e):
+                raise HTTPException(status_code=self.table.conflict_status, detail=self.table.conflict_detail)
+            else:
+                raise HTTPException(status_code=500, detail=f"Error {action} {self.table.label.lower()}")
+
+    def get(self, key, partition=None):
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            if partition is None:
+                execute(cursor, self._by_id, (key,))
+            else:
+                execute(cursor, self._by_id_in, (key, partition))
+            row = cursor.fetchone()
+
+        if not row:
+            raise self._not_found()
+        return self.to_object(row)
+
+    def get_many(self, keys: list) -> list:
+        # One round trip for several keys; missing keys come back as 404 errors in place
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, self._by_ids, (list(keys),))
+            rows = cursor.fetchall()
+
+        found = {row[0]: self.to_object(row) for row in rows}
+        return [found[key] if key in found else self._not_found() for key in keys]
+
+    def list(self, prefetched: list = None, since=None) -> list:
+        # Rows already read by the caller (e.g. a chunk of a streamed list)
+        if prefetched is not None:
+            return prefetched
+
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            if since is None:
+                execute(cursor, self._all)
+            else:
+                execute(cursor, self._since, (since,))
+            rows = cursor.fetchall()
+
+        return list(map(self.to_object, rows))
+
+    def changed(self, since, until) -> list:
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, self._changed, (str(since), str(until)))
+            rows = cursor.fetchall()
+
+        return list(map(self.to_object, rows))
+
+    def stream(self, chunk_size: int, since=None) -> RowStream:
+        # Same rows as list(): a named cursor cannot run a prepared statement, so its SQL is
+        # sent as is, with the parameter bound by psycopg2
+        if since is None:
+            return RowStream(f"{STATEMENTS[self._all]} ORDER BY {self.table.key}", self.to_object, chunk_size)
+        return RowStream(f"{STATEMENTS[self._since].replace('$1', '%s')} ORDER BY {self.table.key}",
+                         self.to_object, chunk_size, (since,))
+
+    def create(self, data):
+        values = self._values(data, self.table.data_columns)
+        return self.to_object(self._write("creating", self._insert, tuple(values)))
+
+    def update(self, data):
+        values = self._values(data, self._updatable)
+        if not any(value is not None for value in values):
+            raise HTTPException(status_code=400, detail="No data to update")
+
+        row = self._write("updating", self._update, (getattr(data, self.table.key), *values))
+        if not row:
+            raise self._not_found()
+        return self.to_object(row)
+
+    def delete(self, key):
+        if self._write("deleting", self._delete, (key,)) == 0:
+            raise self._not_found()
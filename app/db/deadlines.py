@@ -0,0 +1,42 @@
+from app.db.config import get_database_connection
+from app.settings import get_settings
+
+# Only tasks in this status get deadline reminders, see app/reminders/scheduler.py.
+# task_status is not an enum, so "Open" or "in progress" tasks are never reminded.
+OPEN_STATUS = get_settings().reminder_open_status
+OPEN = "task_status = '{}'".format(OPEN_STATUS.replace("'", "''"))
+
+
+def deadline_tracking():
+    # notified_*_for hold the deadline a reminder was last sent for: a new deadline makes
+    # the task due for a reminder again, and so does reopening it (tr_tasks_rearm_reminders)
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE IF EXISTS public.tasks
+            ADD COLUMN IF NOT EXISTS notified_upcoming_for date,
+            ADD COLUMN IF NOT EXISTS notified_overdue_for date;
+
+            CREATE OR REPLACE FUNCTION public.rearm_reminders() RETURNS trigger AS $$
+            BEGIN
+                NEW.notified_upcoming_for := NULL;
+                NEW.notified_overdue_for := NULL;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        # The index predicate follows REMINDER_OPEN_STATUS; it is kept in the index
+        # comment so a changed setting rebuilds the index
+        cursor.execute("SELECT obj_description(to_regclass('public.ix_tasks_open_deadline'), 'pg_class')")
+        if cursor.fetchone()[0] != OPEN:
+            cursor.execute("DROP INDEX IF EXISTS public.ix_tasks_open_deadline")
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS ix_tasks_open_deadline
+            ON public.tasks (deadline, task_id) WHERE {OPEN};
+
+            DROP TRIGGER IF EXISTS tr_tasks_rearm_reminders ON public.tasks;
+            CREATE TRIGGER tr_tasks_rearm_reminders
+            BEFORE UPDATE OF task_status ON public.tasks
+            FOR EACH ROW WHEN (NEW.{OPEN} AND OLD.task_status IS DISTINCT FROM NEW.task_status)
+            EXECUTE FUNCTION public.rearm_reminders();
+        """)
+        cursor.execute("COMMENT ON INDEX public.ix_tasks_open_deadline IS %s", (OPEN,))
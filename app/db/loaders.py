@@ -0,0 +1,27 @@
+from starlette.concurrency import run_in_threadpool
+from strawberry.dataloader import DataLoader
+
+from app.db.crud import Crud
+
+
+def get_loader(info, crud: Crud) -> DataLoader:
+    # One DataLoader per table and request context. Operations of a batched request share
+    # the context, so lookups of the same table across all of them become one query.
+    loaders = info.context.setdefault("loaders", {})
+    name = crud.table.name
+    if name not in loaders:
+        async def load(keys):
+            return await run_in_threadpool(crud.get_many, keys)
+        loaders[name] = DataLoader(load_fn=load)
+    return loaders[name]
+
+
+async def load(info, crud: Crud, key):
+    return await get_loader(info, crud).load(key)
+
+
+def forget(info, crud: Crud, key):
+    # Called after writes so later loads in the same context do not see the cached row
+    loaders = info.context.get("loaders") or {}
+    if crud.table.name in loaders:
+        loaders[crud.table.name].clear(key)
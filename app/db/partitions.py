@@ -0,0 +1,149 @@
+import gzip
+import os
+from datetime import date, datetime, timedelta
+
+from app.db.config import get_database_connection
+from app.jobs.runner import DAY, register_handler, schedule_recurring
+from app.settings import get_settings
+
+# comments is range-partitioned by creation_date into one partition per month
+# (comments_YYYY_MM) plus comments_default for rows outside every range.
+PARENT = "comments"
+DEFAULT_PARTITION = "comments_default"
+
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def _relkind(cursor, table: str):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (f"public.{table}",))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _create_partition(cursor, month: date):
+    name, upper = partition_name(month), _next_month(month)
+    if _relkind(cursor, name) is not None:
+        return
+    cursor.execute(f"CREATE TABLE public.{name} (LIKE public.{PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM public.{DEFAULT_PARTITION}"
+                   f" WHERE creation_date >= %s AND creation_date < %s)", (month, upper))
+    if cursor.fetchone()[0]:
+        # Rows already sitting in the default partition move to their new partition; the
+        # move is not a user delete, so it must not fire the row triggers (tombstones)
+        cursor.execute(f"ALTER TABLE public.{DEFAULT_PARTITION} DISABLE TRIGGER USER")
+        cursor.execute(f"WITH moved AS (DELETE FROM public.{DEFAULT_PARTITION}"
+                       f" WHERE creation_date >= %s AND creation_date < %s RETURNING *)"
+                       f" INSERT INTO public.{name} SELECT * FROM moved", (month, upper))
+        cursor.execute(f"ALTER TABLE public.{DEFAULT_PARTITION} ENABLE TRIGGER USER")
+    cursor.execute(f"ALTER TABLE public.{PARENT} ATTACH PARTITION public.{name}"
+                   f" FOR VALUES FROM (%s) TO (%s)", (month, upper))
+
+
+def _partition_months(first_month: date = None) -> list:
+    this_month = _month(date.today())
+    month = min(first_month or this_month, this_month)
+    last = this_month
+    for _ in range(get_settings().comments_partition_months_ahead):
+        last = _next_month(last)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def ensure_partitions(cursor, first_month: date = None):
+    for month in _partition_months(first_month):
+        _create_partition(cursor, month)
+
+
+def _convert(cursor):
+    # One-off migration of a plain comments table: the partitioned table takes over its
+    # columns, defaults and id sequence, then the rows are copied over in one transaction
+    old = f"{PARENT}_unpartitioned"
+    cursor.execute(f"ALTER TABLE public.{PARENT} RENAME TO {old}")
+    cursor.execute(f"ALTER TABLE public.{old} RENAME CONSTRAINT pk_comment TO pk_{old}")
+    for constraint in ("fk_user_comment", "fk_project_comment"):
+        cursor.execute(f"ALTER TABLE public.{old} DROP CONSTRAINT IF EXISTS {constraint}")
+    cursor.execute(f"CREATE TABLE public.{PARENT} (LIKE public.{old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS,"
+                   f" CONSTRAINT pk_comment PRIMARY KEY (comment_id, creation_date))"
+                   f" PARTITION BY RANGE (creation_date)")
+    cursor.execute(f"ALTER TABLE public.{PARENT} OWNER to {get_settings().db_user}")
+    cursor.execute(f"SELECT pg_get_serial_sequence('public.{old}', 'comment_id')")
+    sequence = cursor.fetchone()[0]
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY public.{PARENT}.comment_id")
+    cursor.execute(f"CREATE TABLE public.{DEFAULT_PARTITION} PARTITION OF public.{PARENT} DEFAULT")
+
+    cursor.execute(f"SELECT min(creation_date) FROM public.{old}")
+    first = cursor.fetchone()[0]
+    ensure_partitions(cursor, _month(first) if first else None)
+    cursor.execute(f"INSERT INTO public.{PARENT} SELECT * FROM public.{old}")
+    cursor.execute(f"DROP TABLE public.{old}")
+
+
+def partition_comments():
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        if _relkind(cursor, PARENT) == "r":
+            _convert(cursor)
+            return
+        if _relkind(cursor, DEFAULT_PARTITION) is None:
+            cursor.execute(f"CREATE TABLE public.{DEFAULT_PARTITION} PARTITION OF public.{PARENT} DEFAULT")
+        ensure_partitions(cursor)
+
+
+def maintain_partitions(job) -> dict:
+    # Daily job: keeps COMMENTS_PARTITION_MONTHS_AHEAD months of partitions ready so new
+    # rows never land in the default partition
+    schedule_partition_maintenance(ahead=1)
+    # One transaction per partition: moving rows out of the default partition can take a
+    # while, and the lease is renewed in between
+    for month in _partition_months():
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            _create_partition(cursor, month)
+        job.progress(ensured=partition_name(month))
+    return {"months_ahead": get_settings().comments_partition_months_ahead}
+
+
+register_handler("comments_partitions", maintain_partitions)
+
+
+def schedule_partition_maintenance(ahead: int = 0):
+    schedule_recurring("comments_partitions", DAY, ahead)
+
+
+def archive_partitions(before: date, directory: str) -> list:
+    # Moves every monthly partition that ends on or before `before` to
+    # <directory>/<partition>.csv.gz and drops it. Each partition is handled in its own
+    # transaction holding a SHARE lock, so no row can change between the copy and the drop.
+    os.makedirs(directory, exist_ok=True)
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT child.relname FROM pg_inherits"
+                       " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+                       " WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname", (f"public.{PARENT}",))
+        partitions = [name for (name,) in cursor.fetchall() if name != DEFAULT_PARTITION]
+
+    archived = []
+    for name in partitions:
+        month = datetime.strptime(name[len(PARENT) + 1:], "%Y_%m").date()
+        if _next_month(month) > before:
+            continue
+        path = os.path.join(directory, f"{name}.csv.gz")
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE public.{name} IN SHARE MODE")
+            with gzip.open(path, "wb") as archive:
+                cursor.copy_expert(f"COPY public.{name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+            cursor.execute(f"ALTER TABLE public.{PARENT} DETACH PARTITION public.{name}")
+            cursor.execute(f"DROP TABLE public.{name}")
+        archived.append(path)
+    return archived
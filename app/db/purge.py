@@ -0,0 +1,111 @@
+import time
+
+from app.db.config import get_database_connection
+from app.db.statements import execute, register
+from app.db.tables import TABLES
+from app.jobs.runner import enqueue, register_handler
+from app.metrics import metrics
+from app.settings import get_settings
+
+# Rows removed before each soft-deleted root, in order. They are the rows the foreign
+# keys would otherwise cascade to in one long DELETE.
+CHILDREN = {
+    "projects": ("project_id", [("tasks", "project_id"), ("comments", "project_id")]),
+    "users": ("user_id", [("tasks", "responsible_id"), ("comments", "user_id")]),
+}
+KEYS = {table.name: table.key for table in TABLES}
+
+for _table, (_key, _children) in CHILDREN.items():
+    register(f"purge_pending_{_table}", f"SELECT {_key} FROM {_table} WHERE deleted_at IS NOT NULL")
+    register(f"purge_state_{_table}", f"SELECT deleted_at FROM {_table} WHERE {_key} = $1")
+    register(f"purge_{_table}", f"DELETE FROM {_table} WHERE {_key} = $1 AND deleted_at IS NOT NULL")
+    for _child, _column in _children:
+        # By key rather than ctid: a ctid only identifies a row within one partition
+        _child_key = KEYS[_child]
+        register(f"purge_{_child}_by_{_column}", f"DELETE FROM {_child} WHERE {_child_key} = ANY(ARRAY("
+                                                 f"SELECT {_child_key} FROM {_child} WHERE {_column} = $1 LIMIT $2))")
+        register(f"count_{_child}_by_{_column}", f"SELECT count(*) FROM {_child} WHERE {_column} = $1")
+
+# Deleting a user cascades to the projects they are responsible for
+register("purge_hide_responsible_projects", "UPDATE projects SET deleted_at = clock_timestamp()"
+                                            " WHERE responsible_id = $1 AND deleted_at IS NULL")
+register("purge_responsible_projects", "SELECT project_id FROM projects WHERE responsible_id = $1")
+register("purge_job_seen", "SELECT 1 FROM jobs WHERE kind = 'purge' AND job_key = $1 LIMIT 1")
+
+
+def _run(statement: str, params: tuple = ()):
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, statement, params)
+        return cursor.fetchall() if cursor.description else cursor.rowcount
+
+
+def deletion_state(table: str, key: int):
+    # None once the row is gone, otherwise (deleted_at, {child table: rows left}). Raises
+    # LookupError for a key that was never deleted through a purge job.
+    rows = _run(f"purge_state_{table}", (key,))
+    if not rows:
+        if not _run("purge_job_seen", (f"purge:{table}:{key}",)):
+            raise LookupError(key)
+        return None
+    deleted_at = rows[0][0]
+    remaining = {}
+    if deleted_at is not None:
+        for child, column in CHILDREN[table][1]:
+            remaining[child] = _run(f"count_{child}_by_{column}", (key,))[0][0]
+    return deleted_at, remaining
+
+
+def _purge(job, table: str, key: int, deleted: dict):
+    settings = get_settings()
+    if table == "users":
+        _run("purge_hide_responsible_projects", (key,))
+        for (project_id,) in _run("purge_responsible_projects", (key,)):
+            _purge(job, "projects", project_id, deleted)
+
+    for child, column in CHILDREN[table][1]:
+        while True:
+            job.check_stopping()
+            count = _run(f"purge_{child}_by_{column}", (key, settings.purge_batch_size))
+            metrics.inc("purge_rows_total", count, table=child)
+            deleted[child] = deleted.get(child, 0) + count
+            job.progress(deleted=deleted)
+            # Until a batch comes back empty: rows can still be added while the root is
+            # hidden, and the root delete must not cascade to them in one statement
+            if count == 0:
+                break
+            # Leave room for other writers and for WAL shipping between batches
+            time.sleep(settings.purge_batch_pause_ms / 1000)
+
+    count = _run(f"purge_{table}", (key,))
+    metrics.inc("purge_rows_total", count, table=table)
+    deleted[table] = deleted.get(table, 0) + count
+
+
+def run_purge(job) -> dict:
+    # Removes a soft-deleted project or user: children go in batches of PURGE_BATCH_SIZE
+    # rows, each in its own short transaction, so no request waits on a huge cascading
+    # DELETE. Safe to rerun after an interruption; deleted rows are simply gone.
+    table, key = job.payload["table"], job.payload["key"]
+    # Only ever purge rows that are (still) soft-deleted: a stale or hand-made job for a
+    # live or missing row must not touch its children
+    rows = _run(f"purge_state_{table}", (key,)) if table in CHILDREN else []
+    if not rows or rows[0][0] is None:
+        return {"deleted": {}, "skipped": "not soft-deleted"}
+    deleted = {}
+    _purge(job, table, key, deleted)
+    return {"deleted": deleted}
+
+
+register_handler("purge", run_purge, internal=True)
+
+
+def enqueue_purge(table: str, key: int) -> dict:
+    return enqueue("purge", {"table": table, "key": key}, job_key=f"purge:{table}:{key}")
+
+
+def enqueue_pending_purges():
+    # Soft-deleted rows whose purge was never enqueued (e.g. a crash right after the
+    # delete); the job key makes this a no-op for purges already queued or running
+    for table in CHILDREN:
+        for (key,) in _run(f"purge_pending_{table}"):
+            enqueue_purge(table, key)
@@ -0,0 +1,42 @@
+import types
+from operator import itemgetter
+
+_row_classes = {}
+
+
+def make_row_class(type_, names: list):
+    # Lightweight stand-in for a Strawberry type: a tuple subclass with one read-only
+    # property per field, built straight from a cursor tuple with cls(row). Strawberry
+    # resolves fields with getattr, so these objects can be returned wherever type_ is expected.
+    key = (type_, tuple(names))
+    if key in _row_classes:
+        return _row_classes[key]
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in names)
+        return f"{type_.__name__}({values})"
+
+    def __eq__(self, other):
+        return all(getattr(self, name) == getattr(other, name, None) for name in names)
+
+    def body(namespace):
+        namespace.update({name: property(itemgetter(index)) for index, name in enumerate(names)})
+        namespace.update(__slots__=(), __repr__=__repr__, __eq__=__eq__, __hash__=None)
+
+    row_class = types.new_class(type_.__name__ + "Row", (tuple,), exec_body=body)
+    _row_classes[key] = row_class
+    return row_class
+
+
+def make_row_factory(type_, names: list, converters: list = ()):
+    row_class = make_row_class(type_, names)
+    if not converters:
+        return row_class
+
+    def row_to_object(row):
+        row = list(row)
+        for index, converter in converters:
+            row[index] = converter(row[index])
+        return row_class(row)
+
+    return row_to_object
@@ -0,0 +1,40 @@
+from app.db.config import get_database_connection
+from app.db.tables import TABLES
+
+# Foreign key columns the purger deletes by, see purge.py
+PURGE_INDEXES = [
+    ("tasks", "project_id"),
+    ("tasks", "responsible_id"),
+    ("comments", "project_id"),
+    ("comments", "user_id"),
+    ("projects", "responsible_id"),
+]
+
+
+def soft_deletes():
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        for table in TABLES:
+            if not table.soft_delete:
+                continue
+            cursor.execute(f"""
+                ALTER TABLE IF EXISTS public.{table.name}
+                ADD COLUMN IF NOT EXISTS deleted_at timestamp with time zone;
+
+                CREATE INDEX IF NOT EXISTS ix_{table.name}_deleted
+                ON public.{table.name} ({table.key}) WHERE deleted_at IS NOT NULL;
+            """)
+            if table.track_changes:
+                # Sync clients see the row as deleted as soon as it is hidden
+                cursor.execute(f"""
+                    DROP TRIGGER IF EXISTS tr_{table.name}_soft_delete ON public.{table.name};
+                    CREATE TRIGGER tr_{table.name}_soft_delete
+                    AFTER UPDATE OF deleted_at ON public.{table.name}
+                    FOR EACH ROW WHEN (OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL)
+                    EXECUTE FUNCTION public.record_tombstone('{table.key}', '{table.name}');
+                """)
+
+        for table_name, column_name in PURGE_INDEXES:
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS ix_{table_name}_{column_name}
+                ON public.{table_name} ({column_name});
+            """)
@@ -0,0 +1,35 @@
+from psycopg2.extensions import connection as _connection
+
+# Fixed SQL issued by the resolvers, registered by name (see app.db.crud for the
+# per-table statements). Each statement is prepared once per pooled connection
+# (PREPARE name AS ...) and then run with EXECUTE, so Postgres parses and plans it
+# only the first time a connection sees it.
+STATEMENTS = {}
+
+
+class PreparedConnection(_connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def register(name: str, sql: str):
+    if name in STATEMENTS and STATEMENTS[name] != sql:
+        raise ValueError(f"Statement {name} already registered with a different query")
+    STATEMENTS[name] = sql
+
+
+def execute(cursor, name: str, params: tuple = ()):
+    connection = cursor.connection
+    prepared = getattr(connection, "prepared", None)
+    if prepared is None:
+        raise TypeError("Prepared statements require a PreparedConnection")
+
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {STATEMENTS[name]};")
+        prepared.add(name)
+
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params)
+    else:
+        cursor.execute(f"EXECUTE {name};")
@@ -0,0 +1,97 @@
+from app.security.hash import get_password_hash
+from app.utils.comments_utils import Comment
+from app.utils.projects_utils import Project
+from app.utils.tasks_utils import Tasks
+from app.utils.user_utils import User
+
+
+class Column:
+    def __init__(self, name: str, default: str = None, to_db=None, from_db=None, read_only: bool = False):
+        self.name = name
+        # Maintained by the database (e.g. by triggers); selected but never written
+        self.read_only = read_only
+        # SQL expression used on insert when the input leaves the column unset
+        self.default = default
+        # Applied to input values before they are written (e.g. password hashing)
+        self.to_db = to_db
+        # Applied to fetched values before building the Strawberry type
+        self.from_db = from_db
+
+
+class Table:
+    def __init__(self, name: str, key: str, columns: list, type_, label: str,
+                 conflict_status: int = 409, conflict_detail: str = None, track_changes: bool = False,
+                 soft_delete: bool = False, partition_key: str = None, parent: tuple = None):
+        self.name = name
+        self.key = key
+        # (column, table): rows are hidden while that parent row is soft-deleted
+        self.parent = parent
+        # Range-partitioned by this column; filtering on it lets Postgres skip partitions
+        self.partition_key = partition_key
+        # Deletes only set deleted_at; the row and its children are purged in the background
+        self.soft_delete = soft_delete
+        # Rows carry updated_at/version and deletes leave tombstones, see change_tracking.py
+        self.track_changes = track_changes
+        if track_changes:
+            columns = columns + [Column("updated_at", read_only=True), Column("version", read_only=True)]
+        # Columns in the order they are selected; the key column comes first
+        self.columns = [Column(key)] + columns
+        self.type = type_
+        self.label = label
+        self.conflict_status = conflict_status
+        self.conflict_detail = conflict_detail or f"{label} already exists"
+
+    @property
+    def column_names(self) -> list:
+        return [column.name for column in self.columns]
+
+    @property
+    def data_columns(self) -> list:
+        return [column for column in self.columns[1:] if not column.read_only]
+
+    @property
+    def live_conditions(self) -> list:
+        # Hide soft-deleted rows and the rows of a soft-deleted parent until the purger
+        # removes them, see purge.py
+        conditions = ["deleted_at IS NULL"] if self.soft_delete else []
+        if self.parent:
+            column, parent = self.parent
+            conditions.append(f"NOT EXISTS (SELECT 1 FROM {parent.name} WHERE {parent.name}.{parent.key}"
+                              f" = {self.name}.{column} AND {parent.name}.deleted_at IS NOT NULL)")
+        return conditions
+
+
+USERS = Table("users", "user_id", [
+    Column("username"),
+    Column("password", to_db=get_password_hash),
+    Column("email"),
+    Column("name"),
+    Column("role_id"),
+], User, "User", conflict_status=400, conflict_detail="Username already exists", soft_delete=True)
+
+PROJECTS = Table("projects", "project_id", [
+    Column("project_name"),
+    Column("project_description"),
+    Column("start_date", default="CURRENT_DATE"),
+    Column("end_date"),
+    Column("responsible_id"),
+], Project, "Project", track_changes=True, soft_delete=True)
+
+TASKS = Table("tasks", "task_id", [
+    Column("task_name"),
+    Column("task_description"),
+    Column("deadline"),
+    Column("task_status"),
+    Column("project_id"),
+    Column("responsible_id"),
+], Tasks, "Task", track_changes=True, parent=("project_id", PROJECTS))
+
+COMMENTS = Table("comments", "comment_id", [
+    Column("comment_content"),
+    Column("creation_date", default="CURRENT_DATE"),
+    Column("user_id"),
+    Column("project_id"),
+], Comment, "Comment", track_changes=True, partition_key="creation_date",
+   parent=("project_id", PROJECTS))
+
+TABLES = [USERS, PROJECTS, TASKS, COMMENTS]
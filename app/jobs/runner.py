@@ -0,0 +1,176 @@
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+import psycopg2
+
+from app.jobs.store import (claim_job, complete_job, enqueue_job, fail_job, release_job, report_progress,
+                            retry_job)
+from app.metrics import metrics
+from app.settings import get_settings
+
+HANDLERS = {}
+DAY = 24 * 60 * 60
+# Kinds only the application itself enqueues, never accepted from the enqueueJob mutation
+INTERNAL_KINDS = set()
+
+
+class JobInterrupted(Exception):
+    # Raised by handlers that stop early because the runner is shutting down
+    pass
+
+
+class Job:
+    # What a handler gets: the claimed row plus ways to report progress and to notice
+    # a shutdown. Reporting progress also renews the job's lease.
+    def __init__(self, row: dict, runner):
+        self.job_id = row["job_id"]
+        self.kind = row["kind"]
+        self.payload = row["payload"]
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.worker = row["locked_by"]
+        self._runner = runner
+
+    def progress(self, **values):
+        report_progress(self.job_id, self.worker, values)
+
+    def check_stopping(self):
+        if self._runner.stopping:
+            raise JobInterrupted()
+
+
+def register_handler(kind: str, handler, internal: bool = False):
+    if kind in HANDLERS and HANDLERS[kind] is not handler:
+        raise ValueError(f"Job handler {kind} is already registered")
+    HANDLERS[kind] = handler
+    if internal:
+        INTERNAL_KINDS.add(kind)
+
+
+def backoff_seconds(attempts: int) -> float:
+    settings = get_settings()
+    delay = min(settings.job_backoff_max_ms, settings.job_backoff_base_ms * 2 ** max(attempts - 1, 0)) / 1000
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.5, 1)
+
+
+def enqueue(kind: str, payload: dict = None, job_key: str = None, run_at=None, max_attempts: int = None) -> dict:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind}")
+    job = enqueue_job(kind, payload or {}, max_attempts or get_settings().job_max_attempts, job_key, run_at)
+    job_runner.wake()
+    return job
+
+
+def schedule_recurring(kind: str, interval: float, ahead: int = 0) -> dict:
+    # One job per interval-long slot, counted from the epoch (daily jobs run at UTC
+    # midnight): the current slot, or the one `ahead` slots later. The job key dedupes
+    # workers that schedule the same slot. Handlers schedule their next slot before doing
+    # any work, so a failed run does not end the chain.
+    now = time.time()
+    slot = int(now // interval) + ahead
+    run_at = datetime.fromtimestamp(slot * interval, timezone.utc) if slot * interval > now else None
+    return enqueue(kind, job_key=f"{kind}:{slot}", run_at=run_at)
+
+
+class JobRunner:
+    # Pool of worker threads claiming jobs from the jobs table. Runs inside each uvicorn
+    # worker (JOB_WORKERS per process, 0 to disable) or standalone with main.py --jobs-only;
+    # any mix of processes can share one table.
+    def __init__(self):
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeups = threading.Semaphore(0)
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def start(self, workers: int = None):
+        workers = get_settings().job_workers if workers is None else workers
+        if self._threads or workers <= 0:
+            return
+        self._stopping.clear()
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        for _ in self._threads:
+            self._wakeups.release()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._threads = []
+
+    def wake(self):
+        # Jobs enqueued by this process start without waiting for the next poll
+        if self._threads:
+            self._wakeups.release()
+
+    def _work(self):
+        settings = get_settings()
+        worker = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        while not self._stopping.is_set():
+            try:
+                row = claim_job(worker, settings.job_lease_seconds)
+            except psycopg2.Error as e:
+                print(f"Error al reclamar trabajos: {e}")
+                row = None
+            if row is None:
+                self._wakeups.acquire(timeout=settings.job_poll_interval_ms / 1000)
+                continue
+            try:
+                self._run(Job(row, self))
+            except Exception as e:
+                # The job stays running until its lease expires and it is claimed again
+                print(f"Error al actualizar el trabajo {row['job_id']}: {e}")
+
+    def _run(self, job: Job):
+        handler = HANDLERS.get(job.kind)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind {job.kind}")
+            result = handler(job)
+            # Encoded here so a result that is not JSON fails the job like any handler error
+            result = None if result is None else json.dumps(result)
+        except JobInterrupted:
+            release_job(job.job_id, job.worker)
+            return
+        except Exception as e:
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if job.attempts < job.max_attempts and handler is not None:
+                metrics.inc("jobs_retried_total", kind=job.kind)
+                retry_job(job.job_id, job.worker, error, backoff_seconds(job.attempts))
+            else:
+                metrics.inc("jobs_failed_total", kind=job.kind)
+                fail_job(job.job_id, job.worker, error)
+            return
+        finally:
+            metrics.observe("job_seconds", time.perf_counter() - start, kind=job.kind)
+
+        metrics.inc("jobs_completed_total", kind=job.kind)
+        complete_job(job.job_id, job.worker, result)
+
+
+job_runner = JobRunner()
+
+
+def serve_jobs(workers: int = None):
+    # Foreground runner for main.py --jobs-only; returns after SIGTERM or SIGINT
+    stop = threading.Event()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, lambda *_: stop.set())
+    job_runner.start(workers)
+    stop.wait()
+    job_runner.stop(get_settings().server_graceful_shutdown_timeout)
@@ -0,0 +1,102 @@
+from typing import Optional
+
+from psycopg2.extras import Json
+
+from app.db.config import get_database_connection
+from app.db.statements import execute, register
+
+JOB_COLUMNS = ("job_id", "kind", "payload", "job_key", "status", "attempts", "max_attempts", "run_at", "locked_at",
+               "locked_by", "progress", "result", "last_error", "created_at", "finished_at")
+_columns = ", ".join(JOB_COLUMNS)
+
+# job_key deduplicates: while a job with the same key is queued or running, enqueueing
+# it again returns the existing job
+register("jobs_enqueue", f"INSERT INTO jobs (kind, payload, job_key, max_attempts, run_at)"
+                         f" VALUES ($1, $2, $3, $4, COALESCE($5, clock_timestamp()))"
+                         f" ON CONFLICT (job_key) WHERE status IN ('queued', 'running') DO NOTHING"
+                         f" RETURNING {_columns}")
+register("jobs_by_active_key", f"SELECT {_columns} FROM jobs WHERE job_key = $1 AND status IN ('queued', 'running')")
+register("jobs_by_id", f"SELECT {_columns} FROM jobs WHERE job_id = $1")
+register("jobs_list", f"SELECT {_columns} FROM jobs WHERE $1::character varying IS NULL OR status = $1"
+                      f" ORDER BY job_id DESC LIMIT $2")
+# Next due job, or a running one whose worker stopped renewing its lease. SKIP LOCKED lets
+# any number of workers, in any process, claim concurrently without blocking each other.
+register("jobs_claim", f"UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                       f" locked_at = clock_timestamp(), locked_by = $1"
+                       f" WHERE job_id = (SELECT job_id FROM jobs"
+                       f"  WHERE (status = 'queued' AND run_at <= clock_timestamp())"
+                       f"  OR (status = 'running' AND locked_at < clock_timestamp() - make_interval(secs => $2))"
+                       f"  ORDER BY run_at, job_id LIMIT 1 FOR UPDATE SKIP LOCKED)"
+                       f" RETURNING {_columns}")
+# Only the worker holding the lease may update a running job: once its lease expired and
+# another worker claimed the job, its late updates match no row
+LEASED = "job_id = $1 AND status = 'running' AND locked_by = $2"
+register("jobs_progress", f"UPDATE jobs SET progress = $3, locked_at = clock_timestamp() WHERE {LEASED}")
+register("jobs_complete", f"UPDATE jobs SET status = 'done', result = $3::jsonb, locked_at = NULL, locked_by = NULL,"
+                          f" finished_at = clock_timestamp() WHERE {LEASED}")
+register("jobs_retry", f"UPDATE jobs SET status = 'queued', last_error = $3, locked_at = NULL, locked_by = NULL,"
+                       f" run_at = clock_timestamp() + make_interval(secs => $4) WHERE {LEASED}")
+register("jobs_fail", f"UPDATE jobs SET status = 'failed', last_error = $3, locked_at = NULL, locked_by = NULL,"
+                      f" finished_at = clock_timestamp() WHERE {LEASED}")
+# Interrupted by shutdown: back to the queue without using up an attempt
+register("jobs_release", f"UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_at = NULL,"
+                         f" locked_by = NULL WHERE {LEASED}")
+register("jobs_requeue", f"UPDATE jobs SET status = 'queued', attempts = 0, run_at = clock_timestamp(),"
+                         f" last_error = NULL, finished_at = NULL WHERE job_id = $1 AND status = 'failed'"
+                         f" RETURNING {_columns}")
+
+
+def _fetch(statement: str, params: tuple) -> list:
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, statement, params)
+        return [dict(zip(JOB_COLUMNS, row)) for row in cursor.fetchall()] if cursor.description else []
+
+
+def enqueue_job(kind: str, payload: dict, max_attempts: int, job_key: str = None, run_at=None) -> dict:
+    while True:
+        jobs = _fetch("jobs_enqueue", (kind, Json(payload), job_key, max_attempts, run_at))
+        if not jobs:
+            jobs = _fetch("jobs_by_active_key", (job_key,))
+        # Empty when the conflicting job finished in between; the next insert goes through
+        if jobs:
+            return jobs[0]
+
+
+def get_job(job_id: int) -> Optional[dict]:
+    jobs = _fetch("jobs_by_id", (job_id,))
+    return jobs[0] if jobs else None
+
+
+def list_jobs(status: Optional[str], limit: int) -> list:
+    return _fetch("jobs_list", (status, limit))
+
+
+def claim_job(worker: str, lease_seconds: int) -> Optional[dict]:
+    jobs = _fetch("jobs_claim", (worker, lease_seconds))
+    return jobs[0] if jobs else None
+
+
+def report_progress(job_id: int, worker: str, progress: dict):
+    _fetch("jobs_progress", (job_id, worker, Json(progress)))
+
+
+def complete_job(job_id: int, worker: str, result: Optional[str]):
+    # result is already JSON-encoded, see JobRunner._run
+    _fetch("jobs_complete", (job_id, worker, result))
+
+
+def retry_job(job_id: int, worker: str, error: str, delay_seconds: float):
+    _fetch("jobs_retry", (job_id, worker, error, delay_seconds))
+
+
+def fail_job(job_id: int, worker: str, error: str):
+    _fetch("jobs_fail", (job_id, worker, error))
+
+
+def release_job(job_id: int, worker: str):
+    _fetch("jobs_release", (job_id, worker))
+
+
+def requeue_failed_job(job_id: int) -> Optional[dict]:
+    jobs = _fetch("jobs_requeue", (job_id,))
+    return jobs[0] if jobs else None
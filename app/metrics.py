@@ -0,0 +1,52 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    # In-process counters and summaries exposed at /metrics in the Prometheus text
+    # format. Each uvicorn worker keeps its own values.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._summaries = defaultdict(lambda: [0, 0.0])
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            summary = self._summaries[self._key(name, labels)]
+            summary[0] += 1
+            summary[1] += value
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(self._key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    @staticmethod
+    def _format(name: str, labels: tuple) -> str:
+        if not labels:
+            return name
+        return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{self._format(name, labels)} {value:g}")
+            for (name, labels), (count, total) in sorted(self._summaries.items()):
+                lines.append(f"{self._format(name + '_count', labels)} {count}")
+                lines.append(f"{self._format(name + '_sum', labels)} {total:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -1,9 +1,11 @@
+from datetime import date
+
 from pydantic import BaseModel
 
 
 class Comment(BaseModel):
     comment_id: int
     comment_content: str
-    creation_date: str
+    creation_date: date
     user_id: int
     project_id: int
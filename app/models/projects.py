@@ -1,3 +1,6 @@
+from datetime import date
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -5,6 +8,6 @@ class Project(BaseModel):
     project_id: int
     project_name: str
     project_description: str
-    start_date: str
-    end_date: str
-    responsible_id: str
+    start_date: date
+    end_date: Optional[date]
+    responsible_id: Optional[int]
@@ -1,3 +1,6 @@
+from datetime import date
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -5,7 +8,7 @@ class Tasks(BaseModel):
     task_id: int
     task_name: str
     task_description: str
-    deadline: str
+    deadline: Optional[date]
     task_status: str
     project_id: int
     responsible_id: int
@@ -0,0 +1,81 @@
+from app.db.config import get_database_connection
+from app.db.deadlines import OPEN
+from app.db.statements import execute, register
+from app.db.tables import TASKS
+from app.jobs.runner import register_handler, schedule_recurring
+from app.metrics import metrics
+from app.reminders.sinks import get_sink
+from app.settings import get_settings
+
+REMINDER_COLUMNS = "task_id, task_name, deadline, project_id, responsible_id"
+# Tasks of a deleted project wait for the purger without reminders
+REMINDABLE = " AND ".join([OPEN] + TASKS.live_conditions)
+
+# Both are bounded range scans on ix_tasks_open_deadline, so a cycle reads only the tasks
+# due in its window, however many open tasks there are. SKIP LOCKED lets several runners
+# share the work; the rows stay locked until they are marked as notified.
+register("reminders_upcoming", f"SELECT {REMINDER_COLUMNS} FROM tasks WHERE {REMINDABLE}"
+                               f" AND deadline >= CURRENT_DATE AND deadline <= CURRENT_DATE + $1::integer"
+                               f" AND notified_upcoming_for IS DISTINCT FROM deadline"
+                               f" ORDER BY deadline, task_id LIMIT $2 FOR UPDATE SKIP LOCKED")
+register("reminders_overdue", f"SELECT {REMINDER_COLUMNS} FROM tasks WHERE {REMINDABLE}"
+                              f" AND deadline < CURRENT_DATE AND deadline >= CURRENT_DATE - $1::integer"
+                              f" AND notified_overdue_for IS DISTINCT FROM deadline"
+                              f" ORDER BY deadline, task_id LIMIT $2 FOR UPDATE SKIP LOCKED")
+register("reminders_mark_upcoming", "UPDATE tasks SET notified_upcoming_for = deadline WHERE task_id = ANY($1)")
+register("reminders_mark_overdue", "UPDATE tasks SET notified_overdue_for = deadline WHERE task_id = ANY($1)")
+register("tasks_due", f"SELECT {', '.join(TASKS.column_names)} FROM tasks WHERE {REMINDABLE}"
+                      f" AND deadline <= CURRENT_DATE + $1::integer ORDER BY deadline, task_id")
+
+
+def due_tasks(within_days: int) -> list:
+    # Open tasks that are overdue or due within the next within_days days
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, "tasks_due", (within_days,))
+        return cursor.fetchall()
+
+
+def _dispatch(sink, kind: str, days: int, batch_size: int) -> int:
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, f"reminders_{kind}", (days, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        reminders = [{"key": f"task:{task_id}:{kind}:{deadline.isoformat()}", "kind": kind, "task_id": task_id,
+                      "task_name": task_name, "deadline": deadline.isoformat(), "project_id": project_id,
+                      "responsible_id": responsible_id}
+                     for task_id, task_name, deadline, project_id, responsible_id in rows]
+        # Sent before the marker is committed: a failing sink rolls the batch back and
+        # the same reminders are tried again next cycle
+        sink.send(reminders)
+        execute(cursor, f"reminders_mark_{kind}", ([row[0] for row in rows],))
+    metrics.inc("reminders_sent_total", len(rows), kind=kind)
+    return len(rows)
+
+
+def send_reminders(job) -> dict:
+    # One scheduler cycle: an "upcoming" reminder for open tasks due within
+    # REMINDER_WINDOW_DAYS and an "overdue" one for those whose deadline passed in the last
+    # REMINDER_OVERDUE_LOOKBACK_DAYS, each sent once per deadline
+    settings = get_settings()
+    schedule_reminders(ahead=1)
+    sink = get_sink()
+    sent = {}
+    for kind, days in (("upcoming", settings.reminder_window_days),
+                       ("overdue", settings.reminder_overdue_lookback_days)):
+        sent[kind] = 0
+        while True:
+            job.check_stopping()
+            count = _dispatch(sink, kind, days, settings.reminder_batch_size)
+            sent[kind] += count
+            job.progress(sent=sent)
+            if count < settings.reminder_batch_size:
+                break
+    return {"sent": sent}
+
+
+register_handler("deadline_reminders", send_reminders)
+
+
+def schedule_reminders(ahead: int = 0):
+    schedule_recurring("deadline_reminders", get_settings().reminder_interval_seconds, ahead)
@@ -0,0 +1,43 @@
+import json
+import os
+
+from app.settings import get_settings
+
+SINKS = {}
+
+
+class LogSink:
+    def send(self, reminders: list):
+        for reminder in reminders:
+            print(f"Reminder ({reminder['kind']}): task {reminder['task_id']} '{reminder['task_name']}'"
+                  f" of project {reminder['project_id']} is due {reminder['deadline']}")
+
+
+class FileSink:
+    # One JSON object per line. Delivery is at least once: a reminder can be written again
+    # if the process dies before it is marked as sent, so readers dedupe on "key".
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, reminders: list):
+        with open(self.path, "a") as file:
+            for reminder in reminders:
+                file.write(json.dumps(reminder) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def register_sink(name: str, factory):
+    # factory() returns an object with send(reminders); it is called once per cycle
+    SINKS[name] = factory
+
+
+def get_sink():
+    name = get_settings().reminder_sink
+    if name not in SINKS:
+        raise ValueError(f"Unknown reminder sink {name}")
+    return SINKS[name]()
+
+
+register_sink("log", LogSink)
+register_sink("file", lambda: FileSink(get_settings().reminder_file))
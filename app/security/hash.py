@@ -1,11 +1,25 @@
 import bcrypt
 
+from app.settings import get_settings
+
 
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=get_settings().bcrypt_rounds)
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed_password.decode('utf-8')
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+_dummy_hash = None
+
+
+def dummy_verify_password(plain_password: str) -> bool:
+    # Same bcrypt cost as a real check, so unknown emails take as long to reject as wrong passwords
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = get_password_hash("dummy-password")
+    verify_password(plain_password, _dummy_hash)
+    return False
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from graphql import GraphQLError
+
+from app.db.config import get_database_connection
+from app.db.statements import execute, register
+from app.settings import get_settings
+
+# Token bucket shared by all workers, refilled and consumed in a single statement.
+# A request is allowed when the returned balance is not negative; rejected requests
+# can push the balance down to -1, so hammering a bucket delays its recovery.
+register("rate_limit_consume", """
+    INSERT INTO rate_limit_buckets AS bucket (bucket_key, tokens, updated_at)
+    VALUES ($1, $2::float8 - 1, clock_timestamp())
+    ON CONFLICT (bucket_key) DO UPDATE SET
+        tokens = GREATEST(-1, LEAST($2::float8, bucket.tokens + $3::float8
+                 * EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at)::float8) - 1),
+        updated_at = clock_timestamp()
+    RETURNING tokens
+""")
+
+
+class RateLimitBackend(ABC):
+    # consume() takes one token from the bucket and returns 0, or returns the number
+    # of seconds until a token is available when the bucket is empty.
+    @abstractmethod
+    def consume(self, key: str, capacity: int, refill_per_second: float) -> float:
+        ...
+
+
+class LocalBackend(RateLimitBackend):
+    # Per-process buckets. Each worker enforces the limits on its own share of traffic.
+    max_buckets = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key: str, capacity: int, refill_per_second: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / refill_per_second
+
+            if len(self._buckets) > self.max_buckets:
+                self._evict_full(now, capacity, refill_per_second)
+        return wait
+
+    def _evict_full(self, now, capacity, refill_per_second):
+        # Buckets that have refilled completely behave like missing ones
+        full_after = capacity / refill_per_second
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+
+class PostgresBackend(RateLimitBackend):
+    def consume(self, key: str, capacity: int, refill_per_second: float) -> float:
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, "rate_limit_consume", (key, capacity, refill_per_second))
+            tokens = cursor.fetchone()[0]
+        return 0.0 if tokens >= 0 else -tokens / refill_per_second
+
+
+_backend = None
+
+
+def set_backend(backend: RateLimitBackend):
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        backends = {"local": LocalBackend, "postgres": PostgresBackend}
+        _backend = backends[get_settings().rate_limit_backend]()
+    return _backend
+
+
+def check_login_rate(ip: str, email: str):
+    settings = get_settings()
+    backend = get_backend()
+    limits = (
+        (f"login:ip:{ip}", settings.login_ip_burst, settings.login_ip_per_minute),
+        (f"login:email:{email}", settings.login_email_burst, settings.login_email_per_minute),
+    )
+    for key, capacity, per_minute in limits:
+        wait = backend.consume(key, capacity, per_minute / 60)
+        if wait:
+            # Raised from the login resolver, so the response is a GraphQL error rather than
+            # an HTTP 429: the retry delay travels in the error extensions
+            raise GraphQLError("Too many login attempts",
+                               extensions={"code": "TOO_MANY_REQUESTS", "retryAfter": math.ceil(wait)})
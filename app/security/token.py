@@ -1,38 +1,220 @@
-import jwt
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
-SECRET_KEY = "your-secret-key"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_TIME = 30
+import jwt
+
+from app.db.catalog import catalog
+from app.db.config import get_database_connection
+from app.db.statements import execute, register
+from app.jobs.runner import DAY, register_handler, schedule_recurring
+from app.settings import get_settings
 
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+register("revoke_token", "INSERT INTO revoked_tokens (jti, expires_at) VALUES ($1, to_timestamp($2))"
+                         " ON CONFLICT (jti) DO NOTHING RETURNING jti")
+register("token_revoked", "SELECT 1 FROM revoked_tokens WHERE jti = $1 AND expires_at > clock_timestamp()")
+register("prune_revoked_tokens", "DELETE FROM revoked_tokens WHERE expires_at <= clock_timestamp()")
+
+
+class KeyStore:
+    # Signing keys. Without JWKS_PATH tokens are signed with SECRET_KEY/ALGORITHM.
+    # With a JWKS file, tokens carry the kid of the signing key and are verified with
+    # the matching key; appending a new key to the file rotates it without a restart.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._active_kid = None
+        self._mtime = None
+
+    def _load(self):
+        settings = get_settings()
+        if not settings.jwks_path:
+            return
+
+        mtime = os.path.getmtime(settings.jwks_path)
+        if mtime == self._mtime:
+            return
+
+        with open(settings.jwks_path, encoding="utf-8") as jwks_file:
+            jwks = json.load(jwks_file)
+
+        keys = {}
+        for jwk_data in jwks.get("keys", []):
+            algorithm = jwk_data.get("alg", settings.algorithm)
+            keys[jwk_data["kid"]] = (jwt.PyJWK(jwk_data, algorithm).key, algorithm)
+        if not keys:
+            raise ValueError(f"No keys found in {settings.jwks_path}")
+
+        self._keys = keys
+        self._active_kid = settings.jwt_active_kid or list(keys)[-1]
+        self._mtime = mtime
+
+    def signing_key(self):
+        settings = get_settings()
+        if not settings.jwks_path:
+            return settings.secret_key, settings.algorithm, None
+
+        with self._lock:
+            self._load()
+            key, algorithm = self._keys[self._active_kid]
+            return key, algorithm, self._active_kid
+
+    def verification_key(self, token: str):
+        settings = get_settings()
+        if not settings.jwks_path:
+            return settings.secret_key, settings.algorithm
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        with self._lock:
+            if kid not in self._keys:
+                self._load()
+            if kid not in self._keys:
+                raise jwt.InvalidTokenError("Unknown signing key")
+            key, algorithm = self._keys[kid]
+
+        # Asymmetric keys are verified with their public half
+        if hasattr(key, "public_key"):
+            key = key.public_key()
+        return key, algorithm
+
+
+class VerifiedTokenCache:
+    # LRU of tokens that already passed signature verification, with their payload.
+    # A cached token is trusted until its exp, so repeat checks are a dict lookup.
+    def __init__(self, max_size: int):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict):
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Denylist:
+    # Revoked token ids (jti), stored in revoked_tokens so every worker sees them. Lookups
+    # are answered by the catalog, which receives each revocation over LISTEN/NOTIFY, and
+    # go to the database while the catalog listener is down.
+    def add(self, jti: str, exp: float) -> bool:
+        # True only for the call that actually revoked the token, so concurrent refreshes
+        # of one refresh token cannot both succeed
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, "revoke_token", (jti, exp))
+            return cursor.fetchone() is not None
+
+    def __contains__(self, jti: str) -> bool:
+        if catalog.live:
+            return catalog.revoked(jti)
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, "token_revoked", (jti,))
+            return cursor.fetchone() is not None
+
+
+key_store = KeyStore()
+token_cache = VerifiedTokenCache(get_settings().token_cache_size)
+denylist = Denylist()
+
+
+def _encode(data: dict, token_type: str, expire: datetime) -> str:
+    key, algorithm, kid = key_store.signing_key()
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_TIME)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex, "typ": token_type})
+    headers = {"kid": kid} if kid else None
+    return jwt.encode(to_encode, key, algorithm=algorithm, headers=headers)
 
 
-def get_id_by_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except jwt.ExpiredSignatureError:
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    if not expires_delta:
+        expires_delta = timedelta(minutes=get_settings().access_token_expire_minutes)
+    return _encode(data, ACCESS_TOKEN, datetime.utcnow() + expires_delta)
+
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
+    if not expires_delta:
+        expires_delta = timedelta(minutes=get_settings().refresh_token_expire_minutes)
+    return _encode(data, REFRESH_TOKEN, datetime.utcnow() + expires_delta)
+
+
+def decode_token(token: str, token_type: str = ACCESS_TOKEN) -> Optional[dict]:
+    if not token:
+        return None
+
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            key, algorithm = key_store.verification_key(token)
+            # The cache and the denylist both rely on exp and jti
+            payload = jwt.decode(token, key, algorithms=[algorithm], options={"require": ["exp", "jti"]})
+        except jwt.ExpiredSignatureError:
+            return None  # Token expired
+        except jwt.InvalidTokenError:
+            return None  # Token invalid
+        token_cache.put(token, payload)
+
+    # Tokens issued before refresh tokens existed carry no typ and are access tokens
+    if payload.get("typ", ACCESS_TOKEN) != token_type:
         return None
-    except jwt.InvalidTokenError:
+    if payload.get("jti") in denylist:
         return None
+    return payload
+
+
+def revoke_token(token: str, token_type: str = ACCESS_TOKEN) -> bool:
+    payload = decode_token(token, token_type)
+    if payload is None:
+        return False
+    return denylist.add(payload["jti"], payload["exp"])
+
+
+def get_id_by_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
 
 
 def verify_token(token: str):
-    try:
-        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return True
-    except jwt.ExpiredSignatureError:
-        return None  # Token expired
-    except jwt.InvalidTokenError:
-        return None  # Token invalid
\ No newline at end of file
+    if decode_token(token) is None:
+        return None
+    return True
+
+
+def prune_revoked_tokens(job) -> dict:
+    # Daily job: expired tokens are rejected by jwt.decode, so their denylist rows can go
+    schedule_token_pruning(ahead=1)
+    with get_database_connection() as connection, connection.cursor() as cursor:
+        execute(cursor, "prune_revoked_tokens")
+        return {"deleted": cursor.rowcount}
+
+
+register_handler("prune_revoked_tokens", prune_revoked_tokens)
+
+
+def schedule_token_pruning(ahead: int = 0):
+    schedule_recurring("prune_revoked_tokens", DAY, ahead)
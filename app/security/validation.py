@@ -1,38 +1,111 @@
+import threading
+import time
+from typing import Optional
+
 import psycopg2
+from fastapi import HTTPException
+from app.db.catalog import catalog
 from app.db.config import get_database_connection
+from app.db.statements import execute, register
 from app.models.user import User
-from app.security.token import get_id_by_token
+from app.security.token import get_id_by_token, verify_token
+from app.settings import get_settings
 
+register("user_role", "SELECT role_id FROM users WHERE user_id = $1 AND deleted_at IS NULL")
+# Emails are compared lower case (see login)
+register("user_by_email", "SELECT user_id, username, password, email, name, role_id FROM users"
+                          " WHERE lower(email) = $1 AND deleted_at IS NULL")
+register("users_emails", "SELECT lower(email) FROM users WHERE deleted_at IS NULL")
 
-def is_user_admin(token: str) -> bool:
+
+class KnownEmails:
+    # Lower-cased emails of existing users, reloaded at most every LOGIN_KNOWN_EMAILS_TTL
+    # seconds. Lets login reject unknown emails without touching the database. One caller
+    # reloads, outside the lock; the others keep answering from the old set meanwhile.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reloading = threading.Lock()
+        self._emails = set()
+        self._added = set()
+        self._loaded_at = None
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > get_settings().login_known_emails_ttl
+
+    def _reload(self):
+        with self._lock:
+            self._added = set()
+        with get_database_connection() as connection, connection.cursor() as cursor:
+            execute(cursor, "users_emails")
+            emails = {email for (email,) in cursor.fetchall()}
+        with self._lock:
+            # Users created while the query ran may be missing from its result
+            self._emails = emails | self._added
+            self._loaded_at = time.monotonic()
+
+    def __contains__(self, email: str) -> bool:
+        # Until the first load there is no old set to answer from, so wait for it
+        if self._stale() and self._reloading.acquire(blocking=self._loaded_at is None):
+            try:
+                if self._stale():
+                    self._reload()
+            finally:
+                self._reloading.release()
+        return email in self._emails
+
+    def add(self, email: str):
+        with self._lock:
+            self._emails.add(email.lower())
+            self._added.add(email.lower())
+
+
+known_emails = KnownEmails()
+
+
+def get_user_role(token: str) -> Optional[int]:
     user_id = get_id_by_token(token)
+    if catalog.live:
+        return catalog.role_of(user_id)
     try:
         with get_database_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute("SELECT role_id FROM users WHERE user_id = %s;", (user_id,))
+                execute(cursor, "user_role", (user_id,))
                 user_data = cursor.fetchone()
 
                 if not user_data:
-                    return False
-                role_id = user_data[0]
-
-                return role_id == 1
+                    return None
+                return user_data[0]
 
     except psycopg2.Error as e:
         print(f"Error al consultar la base de datos: {e}")
-        return False
+        return None
+
+
+def is_user_admin(token: str) -> bool:
+    return get_user_role(token) == 1
 
 
-def get_user_by_email(email: str) -> User:
+def get_request_role(context) -> Optional[int]:
+    # Role of the caller, None when the token is missing or invalid. Admins are also
+    # marked as authenticated in the context, so require_admin does not check again.
+    token = context["request"].headers.get("authorization")
+    if not verify_token(token):
+        return None
+    role_id = get_user_role(token)
+    if role_id == 1:
+        context.setdefault("auth", set()).add(token)
+    return role_id
+
+
+def get_user_by_email(email: str) -> Optional[User]:
     try:
         with get_database_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute("SELECT user_id, username, password, email,"
-                               " name, role_id FROM users WHERE email = %s;", (email,))
+                execute(cursor, "user_by_email", (email,))
                 user_data = cursor.fetchone()
 
                 if not user_data:
-                    raise Exception("User not found")
+                    return None
 
                 user_id, username, password, email, name, role_id = user_data
                 return User(
@@ -47,3 +120,17 @@ def get_user_by_email(email: str) -> User:
     except psycopg2.Error as e:
         print(f"Error al consultar la base de datos: {e}")
         raise Exception(e)
+
+
+def require_admin(info) -> str:
+    token = info.context["request"].headers.get("authorization")
+    # Operations of a batched request share one context and authenticate only once
+    authenticated = info.context.setdefault("auth", set())
+    if token in authenticated:
+        return token
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="Not valid token or token expired")
+    if not is_user_admin(token):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    authenticated.add(token)
+    return token
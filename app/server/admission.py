@@ -0,0 +1,219 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from functools import lru_cache
+
+import orjson
+from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse
+from starlette.responses import JSONResponse
+
+from app.metrics import metrics
+
+MUTATION = "mutation"
+QUERY = "query"
+# Freed slots go to waiting mutations before waiting queries
+PRIORITIES = (MUTATION, QUERY)
+# Scope key of the request's OpenStreams
+OPEN_STREAMS = "admission.open_streams"
+
+
+@lru_cache(maxsize=1024)
+def _has_mutation(query: str) -> bool:
+    if "mutation" not in query:
+        return False
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return False
+    return any(isinstance(definition, OperationDefinitionNode) and definition.operation == OperationType.MUTATION
+               for definition in document.definitions)
+
+
+def request_priority(method: str, body: bytes) -> str:
+    if method != "POST":
+        return QUERY
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return QUERY
+    operations = data if isinstance(data, list) else [data]
+    if any(isinstance(operation, dict) and isinstance(operation.get("query"), str)
+           and _has_mutation(operation["query"]) for operation in operations):
+        return MUTATION
+    return QUERY
+
+
+class Admission:
+    # At most max_concurrent holders; the rest wait in one bounded FIFO per priority
+    # class. A released slot is handed straight to the next waiter.
+    def __init__(self, max_concurrent: int, queue_limits: dict):
+        self.max_concurrent = max_concurrent
+        self.queue_limits = queue_limits
+        self.active = 0
+        self.waiters = {priority: deque() for priority in PRIORITIES}
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.waiters.values())
+
+    async def acquire(self, priority: str, timeout: float) -> bool:
+        if self.active < self.max_concurrent and not self.queued():
+            self.active += 1
+            return True
+
+        queue = self.waiters[priority]
+        if len(queue) >= self.queue_limits[priority] or timeout <= 0:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            # On 3.12 wait_for can time out after release() already handed us the slot
+            return future.done() and not future.cancelled()
+        except asyncio.CancelledError:
+            # Handed a slot just as we were cancelled: pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if future in queue:
+                queue.remove(future)
+
+    def release(self):
+        for priority in PRIORITIES:
+            queue = self.waiters[priority]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(True)
+                    return
+        self.active -= 1
+
+
+class OpenStreams:
+    # Server-side cursors an incremental response keeps open, each on its own pooled connection
+    def __init__(self):
+        self.count = 0
+        self.drained = asyncio.Event()
+        self.drained.set()
+
+    def opened(self):
+        self.count += 1
+        self.drained.clear()
+
+    def closed(self):
+        self.count -= 1
+        if not self.count:
+            self.drained.set()
+
+
+class AdmissionMiddleware:
+    # Load shedding in front of GraphQL: requests wait for an execution slot for at most
+    # their class's queue wait, and are rejected with 503 + Retry-After when the queue is
+    # full or the wait runs out. Admitted requests must finish within request_deadline
+    # seconds (queue time included), otherwise they are cancelled with a 504. Incremental
+    # (multipart @defer/@stream) responses lose the deadline once the first part is sent:
+    # the rest is paced by the client, not by the server's load. They give their slot back
+    # then too, or once their last @stream cursor closes, as each one holds a pooled connection.
+    def __init__(self, app, path: str = "/graphql", max_concurrent: int = 16, max_queued_queries: int = 64,
+                 max_queued_mutations: int = 32, query_wait: float = 1.0, mutation_wait: float = 5.0,
+                 request_deadline: float = 30.0, retry_after: int = 1):
+        self.app = app
+        self.path = path
+        self.admission = Admission(max_concurrent, {QUERY: max_queued_queries, MUTATION: max_queued_mutations})
+        self.waits = {QUERY: query_wait, MUTATION: mutation_wait}
+        self.request_deadline = request_deadline
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        body, receive = await self._buffer_body(receive)
+        if body is None:
+            # Client went away before sending the body
+            return
+        priority = request_priority(scope["method"], body)
+
+        wait = min(self.waits[priority], self.request_deadline)
+        if not await self.admission.acquire(priority, wait):
+            metrics.inc("admission_rejected_total", priority=priority)
+            response = JSONResponse({"detail": "Server overloaded, retry later"}, status_code=503,
+                                    headers={"Retry-After": str(self.retry_after)})
+            await response(scope, receive, send)
+            return
+
+        metrics.observe("admission_wait_seconds", time.monotonic() - start, priority=priority)
+        response_started = multipart = False
+        streaming = asyncio.Event()
+        open_streams = OpenStreams()
+
+        async def send_tracking(message):
+            nonlocal response_started, multipart
+            if message["type"] == "http.response.start":
+                response_started = True
+                multipart = dict(message.get("headers", [])).get(b"content-type", b"").startswith(b"multipart/")
+            elif multipart and message.get("body"):
+                # The streams of the request are all open by the first part
+                streaming.set()
+            await send(message)
+
+        task = asyncio.ensure_future(self.app({**scope, OPEN_STREAMS: open_streams}, receive, send_tracking))
+        streamed = asyncio.ensure_future(streaming.wait())
+        released = False
+        try:
+            remaining = self.request_deadline - (time.monotonic() - start)
+            await asyncio.wait({task, streamed}, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and streaming.is_set():
+                drained = asyncio.ensure_future(open_streams.drained.wait())
+                try:
+                    await asyncio.wait({task, drained}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    drained.cancel()
+                if not task.done():
+                    self.admission.release()
+                    released = True
+            elif not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+                metrics.inc("admission_deadline_exceeded_total", priority=priority)
+                if not response_started:
+                    response = JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+                    await response(scope, receive, send)
+                return
+            await task
+        finally:
+            streamed.cancel()
+            # Cancelled from outside (e.g. the server shutting down): take the request with us
+            task.cancel()
+            if not released:
+                self.admission.release()
+
+    @staticmethod
+    async def _buffer_body(receive):
+        # The priority depends on the operation, so read the body up front and replay it
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None, receive
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
@@ -0,0 +1,121 @@
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import strawberry
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.db.catalog import catalog
+from app.db.changes import schedule_tombstone_pruning
+from app.db.config import warm_pool, close_pool, pool_ready
+from app.db.partitions import schedule_partition_maintenance
+from app.db.purge import enqueue_pending_purges
+from app.reminders.scheduler import schedule_reminders
+from app.jobs.runner import job_runner
+from app.metrics import metrics
+from app.security.token import schedule_token_pruning
+from app.server.admission import AdmissionMiddleware
+from app.server.compression import CompressionMiddleware
+from app.server.graphql_view import GraphQLView
+from app.server.incremental import defer, stream
+from app.server.timeouts import StatementTimeoutExtension
+from app.settings import get_settings
+from app.api.user import UserMutation, UserQuery
+from app.api.login import LoginMutation
+from app.api.projects import ProjectMutation, ProjectQuery
+from app.api.tasks import TaskMutation, TaskQuery, tasks
+from app.api.comments import CommentMutation, CommentQuery, comments
+from app.api.changes import ChangesQuery
+from app.api.deletions import DeletionQuery
+from app.api.jobs import JobMutation, JobQuery
+from app.api.catalog import CatalogQuery
+
+# SDL of the schema below, committed and checked at build time (main.py --check-schema)
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "schema.graphql"
+
+
+@strawberry.type
+class Mutation(UserMutation, LoginMutation, ProjectMutation, TaskMutation, CommentMutation, JobMutation):
+    ...
+
+
+@strawberry.type
+class Query(UserQuery, ProjectQuery, TaskQuery, CommentQuery, ChangesQuery, DeletionQuery, JobQuery,
+            CatalogQuery):
+    ...
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Runs once per worker: open the pool before the first request and close it
+    # after uvicorn has drained in-flight requests on SIGTERM.
+    warm_pool()
+    catalog.start()
+    enqueue_pending_purges()
+    schedule_partition_maintenance()
+    schedule_tombstone_pruning()
+    schedule_token_pruning()
+    schedule_reminders()
+    job_runner.start()
+    _app.state.started = True
+    try:
+        yield
+    finally:
+        _app.state.started = False
+        job_runner.stop()
+        catalog.stop()
+        close_pool()
+
+
+settings = get_settings()
+
+app = FastAPI(lifespan=lifespan)
+app.state.started = False
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size,
+                   gzip_level=settings.gzip_level, brotli_quality=settings.brotli_quality,
+                   threadpool_size=settings.compression_threadpool_size)
+# Added last so it runs first: shed load before any other work is done for the request
+app.add_middleware(AdmissionMiddleware, path="/graphql", max_concurrent=settings.admission_limit,
+                   max_queued_queries=settings.admission_max_queued_queries,
+                   max_queued_mutations=settings.admission_max_queued_mutations,
+                   query_wait=settings.admission_query_wait_ms / 1000,
+                   mutation_wait=settings.admission_mutation_wait_ms / 1000,
+                   request_deadline=settings.admission_request_deadline_ms / 1000,
+                   retry_after=settings.admission_retry_after)
+
+schema = strawberry.Schema(
+    mutation=Mutation,
+    query=Query,
+    directives=[defer, stream],
+    extensions=[StatementTimeoutExtension]
+)
+
+graphql_app = GraphQLView(schema, streamable={"tasks": tasks, "comments": comments})
+
+app.add_route('/graphql', graphql_app)
+
+
+@lru_cache(maxsize=1)
+def schema_sdl() -> str:
+    return SCHEMA_PATH.read_text() if SCHEMA_PATH.exists() else schema.as_str() + "\n"
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics_endpoint():
+    return metrics.render()
+
+
+@app.get('/schema.graphql', response_class=PlainTextResponse)
+def schema_endpoint():
+    return schema_sdl()
+
+
+@app.get('/ready')
+def ready_endpoint():
+    # For load balancers and rolling restarts: 503 until this worker has a warm pool
+    # and a loaded catalog. No I/O. On SIGTERM uvicorn stops accepting connections before
+    # the lifespan shuts down, so draining workers are taken out by failed connects.
+    checks = {"started": app.state.started, "pool": pool_ready(), "catalog": catalog.loaded}
+    ready = all(checks.values())
+    return JSONResponse({"ready": ready, **checks}, status_code=200 if ready else 503)
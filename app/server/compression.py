@@ -0,0 +1,86 @@
+import gzip
+
+import brotli
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import metrics
+
+
+def negotiate_encoding(accept_encoding: str):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    qualities = {coding: accepted.get(coding, accepted.get("*", 0.0)) for coding in ("br", "gzip")}
+    # Highest q-value wins, br on a tie
+    coding = max(qualities, key=qualities.get)
+    return coding if qualities[coding] > 0 else None
+
+
+class CompressionMiddleware:
+    # Compresses complete responses above minimum_size with brotli or gzip, whichever the
+    # client prefers. Streamed responses (more_body) are passed through untouched. Bodies
+    # of threadpool_size bytes or more are compressed in the threadpool so they do not
+    # stall the event loop; smaller ones cost less than the thread hand-off.
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 threadpool_size: int = 65536):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.threadpool_size = threadpool_size
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start_message, streaming
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if message.get("more_body", False):
+                streaming = True
+                await send(start_message)
+                await send(message)
+                return
+
+            metrics.observe("http_response_uncompressed_bytes", len(body))
+            if encoding and len(body) >= self.minimum_size and "content-encoding" not in headers:
+                if len(body) >= self.threadpool_size:
+                    body = await run_in_threadpool(self.compress, body, encoding)
+                else:
+                    body = self.compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+            metrics.observe("http_response_bytes", len(body), encoding=headers.get("content-encoding", "identity"))
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Optional
+
+import orjson
+from graphql import GraphQLError, OperationDefinitionNode, OperationType as DocumentOperationType, parse, print_ast
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from strawberry.asgi import GraphQL
+from strawberry.http.exceptions import HTTPException
+from strawberry.types.graphql import OperationType
+from strawberry.unset import UNSET
+
+from app.db.config import ConnectionTracker, shared_connection, track_connections
+from app.metrics import metrics
+from app.security.validation import get_request_role
+from app.server.incremental import IncrementalExecutor, wants_incremental
+from app.server.single_flight import SingleFlight
+from app.settings import get_settings
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> Optional[str]:
+    # Canonical text of a read-only document (no comments or formatting differences),
+    # None for anything that is not made only of queries
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    operations = [definition for definition in document.definitions if isinstance(definition, OperationDefinitionNode)]
+    if not operations or any(operation.operation != DocumentOperationType.QUERY for operation in operations):
+        return None
+    return print_ast(document)
+
+
+class GraphQLView(GraphQL):
+    def __init__(self, schema, streamable: dict = None, **kwargs):
+        super().__init__(schema, **kwargs)
+        self.incremental = IncrementalExecutor(schema, streamable or {})
+        self.single_flight = SingleFlight("graphql")
+
+    async def run(self, request, context=UNSET, root_value=UNSET):
+        if request.method == "POST":
+            # Read the whole body first; afterwards the only message left to receive is the
+            # client disconnect, which cancel_on_disconnect() waits for
+            body = await request.body()
+            if body.lstrip()[:1] == b"[" and "application/json" in request.headers.get("content-type", ""):
+                return await self.cancel_on_disconnect(request, self.run_batch(request, body))
+        if request.method == "POST" and "multipart/mixed" in request.headers.get("accept", ""):
+            request_data = await self.parse_http_body(self.request_adapter_class(request))
+            if wants_incremental(request, request_data.query):
+                # StreamingResponse stops the stream itself when the client disconnects
+                sub_response = await self.get_sub_response(request)
+                return self.incremental.response(request, sub_response, request_data.query,
+                                                 request_data.variables, request_data.operation_name)
+        return await self.cancel_on_disconnect(request, super().run(request, context, root_value))
+
+    async def cancel_on_disconnect(self, request, operation):
+        # Runs the operation as a task. If the client disconnects first (or this request is
+        # cancelled, e.g. by its deadline), the task is cancelled along with the queries it
+        # has running on Postgres; their connections are rolled back and returned to the pool.
+        tracker = ConnectionTracker()
+        with track_connections(tracker):
+            task = asyncio.ensure_future(operation)
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(request))
+        try:
+            await asyncio.wait((task, disconnected), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            # pg_cancel_backend blocks, so keep it off the event loop here too
+            await run_in_threadpool(tracker.cancel)
+            raise
+        finally:
+            disconnected.cancel()
+
+        if task.done():
+            return task.result()
+
+        metrics.inc("graphql_client_disconnects_total")
+        task.cancel()
+        await run_in_threadpool(tracker.cancel)
+        await asyncio.wait((task,))
+        # Nobody is listening any more; 499 is only what ends up in the access log
+        return Response(status_code=499)
+
+    @staticmethod
+    async def _wait_for_disconnect(request):
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    # Identical queries (same normalized document, variables and caller role) that arrive
+    # while one of them is executing share that execution and its result.
+    async def execute_operation(self, request, context, root_value):
+        request_adapter = self.request_adapter_class(request)
+        request_data = await self.parse_http_body(request_adapter)
+        allowed_operation_types = OperationType.from_http(request_adapter.method)
+        if not self.allow_queries_via_get and request_adapter.method == "GET":
+            allowed_operation_types = allowed_operation_types - {OperationType.QUERY}
+
+        def work():
+            return self.schema.execute(request_data.query, root_value=root_value,
+                                       variable_values=request_data.variables, context_value=context,
+                                       operation_name=request_data.operation_name,
+                                       allowed_operation_types=allowed_operation_types)
+
+        document = normalize_query(request_data.query) if request_data.query else None
+        if document is None or OperationType.QUERY not in allowed_operation_types:
+            return await work()
+
+        role = await run_in_threadpool(get_request_role, context)
+        key = (document, orjson.dumps(request_data.variables, option=orjson.OPT_SORT_KEYS),
+               request_data.operation_name, role)
+        return await self.single_flight.do(key, work)
+
+    # A JSON array of operations in one POST. They run concurrently on one context, so
+    # authentication happens once and DataLoaders batch lookups across all of them, and
+    # on one pooled connection. The response is the array of results, in request order.
+    async def run_batch(self, request, body: bytes):
+        try:
+            operations = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise HTTPException(400, "Unable to parse request body as JSON") from e
+
+        max_batch_size = get_settings().graphql_max_batch_size
+        if not operations:
+            raise HTTPException(400, "No GraphQL query found in the request")
+        if len(operations) > max_batch_size:
+            raise HTTPException(400, f"Batch of {len(operations)} operations exceeds the limit of {max_batch_size}")
+
+        sub_response = await self.get_sub_response(request)
+        context = await self.get_context(request, response=sub_response)
+        root_value = await self.get_root_value(request)
+
+        metrics.observe("graphql_batch_operations", len(operations))
+        with shared_connection():
+            results = await asyncio.gather(*(self.execute_batched(request, operation, context, root_value)
+                                             for operation in operations))
+        return self.create_response(response_data=results, sub_response=sub_response)
+
+    async def execute_batched(self, request, operation, context, root_value) -> dict:
+        if not isinstance(operation, dict) or not operation.get("query"):
+            return {"data": None, "errors": [{"message": "No GraphQL query found in the request"}]}
+
+        result = await self.schema.execute(operation["query"], variable_values=operation.get("variables"),
+                                           context_value=context, root_value=root_value,
+                                           operation_name=operation.get("operationName"),
+                                           allowed_operation_types=OperationType.from_http("POST"))
+        response_data = await self.process_result(request=request, result=result)
+        if result.errors:
+            self._handle_errors(result.errors, response_data)
+        return response_data
+
+    # Encodes results with orjson, which returns bytes; Starlette sends them as is.
+    def encode_json(self, response_data) -> bytes:
+        start = time.perf_counter()
+        encoded = orjson.dumps(response_data)
+        metrics.observe("graphql_serialize_seconds", time.perf_counter() - start)
+        metrics.observe("graphql_response_json_bytes", len(encoded))
+        return encoded
@@ -0,0 +1,239 @@
+import copy
+import typing
+from inspect import isawaitable
+
+import anyio
+import orjson
+import strawberry
+from graphql import (DocumentNode, FieldNode, InlineFragmentNode, OperationDefinitionNode, OperationType,
+                     SelectionSetNode, execute, parse, validate, GraphQLError)
+from graphql.execution.values import get_argument_values, get_directive_values
+from psycopg2.errors import QueryCanceled
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from strawberry.directive import DirectiveLocation
+
+from app.db.config import ConnectionTracker, statement_timeout, track_connections
+from app.server.admission import OPEN_STREAMS
+from app.server.timeouts import operation_timeout
+from app.settings import get_settings
+
+BOUNDARY = "-"
+INCREMENTAL_DIRECTIVES = ("defer", "stream")
+
+
+@strawberry.directive(locations=[DirectiveLocation.INLINE_FRAGMENT, DirectiveLocation.FRAGMENT_SPREAD],
+                      description="Deliver this fragment after the initial response (multipart/mixed only)")
+def defer(value: str, label: typing.Optional[str] = None):
+    return value
+
+
+@strawberry.directive(locations=[DirectiveLocation.FIELD],
+                      description="Deliver list items incrementally after initialCount (multipart/mixed only)")
+def stream(value: str, initialCount: int = 0, label: typing.Optional[str] = None):  # noqa: N803
+    # Strawberry passes directive arguments by their GraphQL name, hence initialCount
+    return value
+
+
+def wants_incremental(request, query: typing.Optional[str]) -> bool:
+    accept = request.headers.get("accept", "")
+    return bool(query) and "multipart/mixed" in accept and any(f"@{name}" in query
+                                                                for name in INCREMENTAL_DIRECTIVES)
+
+
+def _part(payload: dict) -> bytes:
+    return (f"\r\n--{BOUNDARY}\r\nContent-Type: application/json; charset=utf-8\r\n\r\n".encode()
+            + orjson.dumps(payload))
+
+
+def _without_directives(node, names=INCREMENTAL_DIRECTIVES):
+    node = copy.copy(node)
+    node.directives = tuple(directive for directive in node.directives or () if directive.name.value not in names)
+    return node
+
+
+def _open_stream(crud, chunk_size: int, field_name: str, arguments: dict):
+    with statement_timeout(operation_timeout([field_name])):
+        return crud.stream(chunk_size, **arguments)
+
+
+class IncrementalResponse(StreamingResponse):
+    # The stream is cancelled on disconnect only once the worker thread it waits for
+    # returns, so cancel the queries still running for it right away
+    def __init__(self, content, tracker: ConnectionTracker, **kwargs):
+        super().__init__(content, **kwargs)
+        self.tracker = tracker
+
+    async def listen_for_disconnect(self, receive):
+        await super().listen_for_disconnect(receive)
+        await run_in_threadpool(self.tracker.cancel)
+
+
+class IncrementalExecutor:
+    # @defer / @stream on top of graphql-core 3.2, which has no incremental execution.
+    # Supported shapes: @defer on top-level inline fragments and @stream on top-level list
+    # fields backed by a Crud (tasks, comments). The initial payload holds the remaining
+    # fields plus the first initialCount items; deferred fragments follow, then the
+    # streamed items, read in chunks from a server-side cursor.
+    def __init__(self, schema, streamable: dict):
+        self.schema = schema
+        self.streamable = streamable
+
+    def _directive(self, node, name: str, variables: dict) -> typing.Optional[dict]:
+        for directive in node.directives or ():
+            if directive.name.value == name:
+                return get_directive_values(self.schema._schema.get_directive(name), node, variables) or {}
+        return None
+
+    def _document(self, document: DocumentNode, operation: OperationDefinitionNode, selections) -> DocumentNode:
+        fragments = [definition for definition in document.definitions
+                     if not isinstance(definition, OperationDefinitionNode)]
+        operation = copy.copy(operation)
+        operation.selection_set = SelectionSetNode(selections=tuple(selections))
+        return DocumentNode(definitions=(operation, *fragments))
+
+    def plan(self, query: str, variables: dict, operation_name: typing.Optional[str]):
+        document = parse(query)
+        errors = validate(self.schema._schema, document)
+        if errors:
+            raise errors[0]
+
+        operations = [definition for definition in document.definitions
+                      if isinstance(definition, OperationDefinitionNode)
+                      and (operation_name is None or definition.name and definition.name.value == operation_name)]
+        if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+            raise GraphQLError("Incremental delivery needs exactly one query operation")
+        operation = operations[0]
+
+        initial, deferred, streamed = [], [], []
+        for selection in operation.selection_set.selections:
+            defer_arguments = self._directive(selection, "defer", variables)
+            stream_arguments = self._directive(selection, "stream", variables)
+            if isinstance(selection, InlineFragmentNode) and defer_arguments is not None:
+                deferred.append((_without_directives(selection), defer_arguments.get("label")))
+            elif isinstance(selection, FieldNode) and stream_arguments is not None \
+                    and selection.name.value in self.streamable:
+                if stream_arguments.get("initialCount", 0) < 0:
+                    raise GraphQLError("initialCount must not be negative")
+                streamed.append((_without_directives(selection), stream_arguments.get("initialCount", 0),
+                                 stream_arguments.get("label")))
+            else:
+                initial.append(_without_directives(selection))
+        return document, operation, initial, deferred, streamed
+
+    async def payloads(self, request, sub_response, query: str, variables: dict,
+                       operation_name: typing.Optional[str]):
+        variables = variables or {}
+        try:
+            document, operation, initial, deferred, streamed = self.plan(query, variables, operation_name)
+        except GraphQLError as error:
+            yield {"errors": [error.formatted], "hasNext": False}
+            return
+
+        chunk_size = get_settings().stream_chunk_size
+        open_streams = request.scope.get(OPEN_STREAMS)
+        context = {"request": request, "response": sub_response}
+        data, errors = {}, []
+
+        async def run(selections, prefetched=None):
+            query_context = context if prefetched is None else {**context, "prefetched": prefetched}
+            result = execute(self.schema._schema, self._document(document, operation, selections),
+                             context_value=query_context, variable_values=variables)
+            if isawaitable(result):
+                result = await result
+            return result.data or {}, [error.formatted for error in result.errors or ()]
+
+        # Each streamed field keeps a server-side cursor open until its last chunk is sent
+        streams = []
+        try:
+            if initial:
+                initial_data, initial_errors = await run(initial)
+                data.update(initial_data)
+                errors.extend(initial_errors)
+
+            for field, initial_count, label in streamed:
+                key = field.alias.value if field.alias else field.name.value
+                # Resolve the field once with no rows first: its resolver authorizes the
+                # request, and no cursor is opened for a request that is not allowed
+                field_data, field_errors = await run([field], [])
+                if field_errors:
+                    data[key] = None
+                    errors.extend(field_errors)
+                    continue
+                # The cursor must select what the field's resolver would (e.g. comments(since:))
+                arguments = get_argument_values(self.schema._schema.query_type.fields[field.name.value], field,
+                                                variables)
+                rows = await run_in_threadpool(_open_stream, self.streamable[field.name.value], chunk_size,
+                                               field.name.value, arguments)
+                streams.append((field, key, label, rows))
+                if open_streams is not None:
+                    open_streams.opened()
+                first = await run_in_threadpool(rows.take, initial_count) if initial_count else []
+                data[key] = []
+                if first:
+                    field_data, field_errors = await run([field], first)
+                    data[key] = field_data.get(key) or []
+                    errors.extend(field_errors)
+
+            payload = {"data": data, "hasNext": bool(deferred or streams)}
+            if errors:
+                payload["errors"] = errors
+            yield payload
+
+            for index, (fragment, label) in enumerate(deferred):
+                fragment_data, fragment_errors = await run(fragment.selection_set.selections)
+                incremental = {"data": fragment_data, "path": []}
+                if label:
+                    incremental["label"] = label
+                if fragment_errors:
+                    incremental["errors"] = fragment_errors
+                yield {"incremental": [incremental], "hasNext": index < len(deferred) - 1 or bool(streams)}
+
+            for field, key, label, rows in streams:
+                offset = len(data[key])
+                while True:
+                    chunk = await run_in_threadpool(rows.take, chunk_size)
+                    if not chunk:
+                        break
+                    field_data, field_errors = await run([field], chunk)
+                    items = field_data.get(key) or []
+                    incremental = {"items": items, "path": [key, offset]}
+                    if label:
+                        incremental["label"] = label
+                    if field_errors:
+                        incremental["errors"] = field_errors
+                    yield {"incremental": [incremental], "hasNext": True}
+                    if field_errors:
+                        # Later chunks would fail the same way, and offsets would be off
+                        break
+                    offset += len(items)
+
+            if streams:
+                yield {"hasNext": False}
+        finally:
+            with anyio.CancelScope(shield=True):
+                for _, _, _, rows in streams:
+                    try:
+                        await run_in_threadpool(rows.close)
+                    finally:
+                        if open_streams is not None:
+                            open_streams.closed()
+
+    def response(self, request, sub_response, query: str, variables: dict,
+                 operation_name: typing.Optional[str]) -> StreamingResponse:
+        tracker = ConnectionTracker()
+
+        async def body():
+            with track_connections(tracker):
+                try:
+                    async for payload in self.payloads(request, sub_response, query, variables, operation_name):
+                        yield _part(payload)
+                except QueryCanceled:
+                    # Cancelled by listen_for_disconnect; there is no one left to answer
+                    if tracker.cancelled:
+                        return
+                    raise
+            yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+        return IncrementalResponse(body(), tracker,
+                                   media_type=f'multipart/mixed; boundary="{BOUNDARY}"; deferSpec=20220824')
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from app.metrics import metrics
+
+
+class SingleFlight:
+    # Coalesces identical concurrent calls: the first caller for a key runs the work and
+    # everyone arriving while it is in flight awaits the same result. Nothing is cached
+    # once the call completes.
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+
+    async def do(self, key, work):
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.inc("single_flight_hits_total", flight=self.name)
+            start = time.perf_counter()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. its client went away); run the work ourselves
+                if not future.cancelled():
+                    raise
+                return await work()
+            finally:
+                metrics.observe("single_flight_wait_seconds", time.perf_counter() - start, flight=self.name)
+
+        metrics.inc("single_flight_misses_total", flight=self.name)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so an exception without waiters is not logged as lost
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from graphql import FieldNode, InlineFragmentNode
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import SchemaExtension
+
+from app.db.config import statement_timeout
+from app.settings import get_settings
+
+
+def operation_timeout(field_names) -> Optional[int]:
+    # Largest configured statement_timeout among the top-level fields, None if none is set
+    timeouts = get_settings().operation_timeouts
+    configured = [timeouts[name] for name in field_names if name in timeouts]
+    return max(configured) if configured else None
+
+
+def top_level_fields(selection_set) -> list:
+    names = []
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            names.append(selection.name.value)
+        elif isinstance(selection, InlineFragmentNode):
+            names.extend(top_level_fields(selection.selection_set))
+    return names
+
+
+class StatementTimeoutExtension(SchemaExtension):
+    # Applies DB_OPERATION_TIMEOUTS to every query the operation's resolvers run
+    def on_execute(self):
+        execution_context = self.execution_context
+        operation = get_operation_ast(execution_context.graphql_document, execution_context.operation_name)
+        timeout = operation_timeout(top_level_fields(operation.selection_set)) if operation else None
+        with statement_timeout(timeout):
+            yield
@@ -0,0 +1,174 @@
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+# Every field can be overridden with an environment variable of the same name in
+# upper case (DB_HOST, SERVER_WORKERS, ...). SETTINGS_FILE may point to a JSON file
+# or a KEY=VALUE file; environment variables take precedence over the file.
+SETTINGS_FILE_ENV = "SETTINGS_FILE"
+
+
+class Settings(BaseModel):
+    # Database
+    db_name: str = "postgres"
+    db_user: str = "postgres"
+    db_password: str = "postgres"
+    db_host: str = "db"
+    db_port: int = 5432
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    # How long a checkout waits for a free connection before failing with a 503
+    db_pool_wait_ms: int = 2000
+    db_statement_timeout_ms: int = 30000
+    db_connect_timeout: int = 10
+    # statement_timeout overrides per top-level GraphQL field, e.g. "tasks=120000,login=5000"
+    db_operation_timeouts: str = ""
+
+    # Server
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None
+    server_graceful_shutdown_timeout: int = 30
+
+    # Responses
+    compression_minimum_size: int = 1024
+    compression_threadpool_size: int = 65536
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    stream_chunk_size: int = 500
+    graphql_max_batch_size: int = 20
+
+    # Admission control (per worker); waits and deadline in milliseconds. The concurrency
+    # limit defaults to the pool connections left over by the job workers
+    admission_max_concurrent: Optional[int] = None
+    admission_max_queued_queries: int = 64
+    admission_max_queued_mutations: int = 32
+    admission_query_wait_ms: int = 1000
+    admission_mutation_wait_ms: int = 5000
+    admission_request_deadline_ms: int = 30000
+    admission_retry_after: int = 1
+
+    # Delta sync; cursors older than the retention must do a full sync
+    tombstone_retention_days: int = 30
+
+    # Background purge of deleted projects and users
+    purge_batch_size: int = 1000
+    purge_batch_pause_ms: int = 50
+
+    # Comments partitions (one per month of creation_date)
+    comments_partition_months_ahead: int = 3
+    comments_archive_dir: str = "archive"
+
+    # Deadline reminders, see app/reminders/
+    reminder_sink: str = "log"
+    reminder_file: str = "reminders.jsonl"
+    reminder_interval_seconds: int = 300
+    # task_status is free text: only tasks with exactly this status get reminders
+    reminder_open_status: str = "open"
+    reminder_window_days: int = 1
+    reminder_overdue_lookback_days: int = 7
+    reminder_batch_size: int = 500
+
+    # Job runner
+    job_workers: int = 2
+    job_poll_interval_ms: int = 1000
+    job_lease_seconds: int = 300
+    job_max_attempts: int = 5
+    job_backoff_base_ms: int = 1000
+    job_backoff_max_ms: int = 300000
+
+    # In-memory catalog of roles and users, see app/db/catalog.py
+    catalog_heartbeat_seconds: int = 30
+    catalog_retry_seconds: int = 1
+    # TCP keepalive probe interval of the listener connection; it is dropped after three
+    # unanswered probes, or when sent data stays unacknowledged for three intervals
+    catalog_keepalive_seconds: int = 10
+
+    # Caches
+    token_cache_size: int = 4096
+
+    # Security
+    bcrypt_rounds: int = 12
+    secret_key: str = "your-secret-key"
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 15
+    refresh_token_expire_minutes: int = 30 * 24 * 60
+    jwks_path: Optional[str] = None
+    jwt_active_kid: Optional[str] = None
+
+    # Login throttling
+    rate_limit_backend: str = "local"
+    login_ip_burst: int = 20
+    login_ip_per_minute: int = 10
+    login_email_burst: int = 5
+    login_email_per_minute: int = 2
+    login_known_emails_only: bool = False
+    login_known_emails_ttl: int = 60
+
+    @property
+    def workers(self) -> int:
+        return self.server_workers or os.cpu_count() or 1
+
+    @property
+    def admission_limit(self) -> int:
+        return self.admission_max_concurrent or max(self.db_pool_max_size - self.job_workers, 1)
+
+    _operation_timeouts: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context):
+        # Parsed once, so a malformed DB_OPERATION_TIMEOUTS fails at startup, not per request
+        self._operation_timeouts = _parse_operation_timeouts(self.db_operation_timeouts)
+
+    @property
+    def operation_timeouts(self) -> dict:
+        return self._operation_timeouts
+
+
+def _parse_operation_timeouts(value: str) -> dict:
+    timeouts = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        field, _, milliseconds = item.partition("=")
+        if not field.strip() or not milliseconds.strip().isdigit():
+            raise ValueError(f"Invalid DB_OPERATION_TIMEOUTS entry {item!r}, expected field=milliseconds")
+        timeouts[field.strip()] = int(milliseconds)
+    return timeouts
+
+
+def _read_settings_file(path: str) -> dict:
+    with open(path, encoding="utf-8") as settings_file:
+        content = settings_file.read()
+
+    if path.endswith(".json"):
+        return json.loads(content)
+
+    values = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        values[key.strip().lower()] = value.strip().strip("\"'")
+    return values
+
+
+def load_settings(environ: Optional[dict] = None) -> Settings:
+    environ = os.environ if environ is None else environ
+    values = {}
+
+    settings_file = environ.get(SETTINGS_FILE_ENV)
+    if settings_file:
+        values.update(_read_settings_file(settings_file))
+
+    for name in Settings.model_fields:
+        if name.upper() in environ:
+            values[name] = environ[name.upper()]
+
+    return Settings(**values)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return load_settings()
@@ -0,0 +1,16 @@
+import strawberry
+
+
+@strawberry.type
+class Role:
+    role_id: int
+    role: str
+    role_description: str
+
+
+@strawberry.type
+class UserSummary:
+    user_id: int
+    username: str
+    name: str
+    role_id: int
@@ -0,0 +1,50 @@
+import base64
+import strawberry
+from datetime import datetime
+from enum import Enum
+from typing import List, NewType
+
+from app.utils.comments_utils import Comment
+from app.utils.projects_utils import Project
+from app.utils.tasks_utils import Tasks
+
+
+def encode_cursor(watermark: int) -> str:
+    return base64.urlsafe_b64encode(f"xid:{watermark}".encode()).decode()
+
+
+def decode_cursor(value: str) -> int:
+    try:
+        prefix, _, watermark = base64.urlsafe_b64decode(value.encode()).decode().partition(":")
+        if prefix != "xid":
+            raise ValueError(value)
+        return int(watermark)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid sync cursor") from e
+
+
+Cursor = strawberry.scalar(NewType("Cursor", int), serialize=encode_cursor, parse_value=decode_cursor,
+                           description="Opaque sync watermark returned by changes")
+
+
+@strawberry.enum
+class EntityType(Enum):
+    PROJECT = "projects"
+    TASK = "tasks"
+    COMMENT = "comments"
+
+
+@strawberry.type
+class Tombstone:
+    entity_type: EntityType
+    entity_id: int
+    deleted_at: datetime
+
+
+@strawberry.type
+class ChangeSet:
+    projects: List[Project]
+    tasks: List[Tasks]
+    comments: List[Comment]
+    deleted: List[Tombstone]
+    cursor: Cursor
@@ -1,27 +1,36 @@
 import strawberry
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
+
+from app.db.catalog import catalog
+from app.utils.catalog_utils import UserSummary
 
-current_time = datetime.now().strftime("%Y-%m-%d")
 
 @strawberry.type
 class Comment:
     comment_id: int
     comment_content: str
-    creation_date: str
+    creation_date: date
     user_id: int
     project_id: int
+    updated_at: datetime
+    version: int
+
+    @strawberry.field
+    def user(self) -> Optional[UserSummary]:
+        return catalog.user(self.user_id)
 
 @strawberry.type
 class CommentResponse:
     success: bool
     message: str
+    comment: Optional[Comment] = None
 
 
 @strawberry.input
 class CommentInputCreate:
     comment_content: str
-    creation_date: Optional[str] = current_time
+    creation_date: Optional[date] = None
     user_id: int
     project_id: int
 
@@ -29,6 +38,5 @@ class CommentInputCreate:
 class CommentUpdateInput:
     comment_id: int
     comment_content: Optional[str] = None
-    creation_date: Optional[str] = None
     user_id: Optional[int] = None
     project_id: Optional[int] = None
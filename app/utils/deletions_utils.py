@@ -0,0 +1,32 @@
+import strawberry
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+
+@strawberry.enum
+class DeletableType(Enum):
+    PROJECT = "projects"
+    USER = "users"
+
+
+@strawberry.enum
+class DeletionStatus(Enum):
+    NOT_DELETED = "not_deleted"
+    PURGING = "purging"
+    DONE = "done"
+
+
+@strawberry.type
+class RemainingRows:
+    table: str
+    rows: int
+
+
+@strawberry.type
+class DeletionJob:
+    entity_type: DeletableType
+    entity_id: int
+    status: DeletionStatus
+    deleted_at: Optional[datetime] = None
+    remaining: List[RemainingRows] = strawberry.field(default_factory=list)
@@ -0,0 +1,48 @@
+import strawberry
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from strawberry.scalars import JSON
+
+
+@strawberry.enum
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@strawberry.type
+class Job:
+    job_id: int
+    kind: str
+    payload: JSON
+    job_key: Optional[str]
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    locked_at: Optional[datetime]
+    locked_by: Optional[str]
+    progress: Optional[JSON]
+    result: Optional[JSON]
+    last_error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+
+@strawberry.type
+class JobResponse:
+    success: bool
+    message: str
+    job: Optional[Job] = None
+
+
+@strawberry.input
+class JobInput:
+    kind: str
+    payload: Optional[JSON] = None
+    job_key: Optional[str] = None
+    run_at: Optional[datetime] = None
+    max_attempts: Optional[int] = None
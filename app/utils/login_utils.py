@@ -1,4 +1,5 @@
 import strawberry
+from typing import Optional
 
 
 @strawberry.input
@@ -12,3 +13,10 @@ class LoginResponse:
     success: bool
     message: str
     token: str
+    refresh_token: Optional[str] = None
+
+
+@strawberry.type
+class LogoutResponse:
+    success: bool
+    message: str
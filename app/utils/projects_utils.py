@@ -1,8 +1,9 @@
 import strawberry
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
-current_time = datetime.now().strftime("%Y-%m-%d")
+from app.db.catalog import catalog
+from app.utils.catalog_utils import UserSummary
 
 
 @strawberry.type
@@ -10,23 +11,30 @@ class Project:
     project_id: int
     project_name: str
     project_description: str
-    start_date: str
-    end_date: str
-    responsible_id: str
+    start_date: date
+    end_date: Optional[date]
+    responsible_id: Optional[int]
+    updated_at: datetime
+    version: int
+
+    @strawberry.field
+    def responsible(self) -> Optional[UserSummary]:
+        return catalog.user(self.responsible_id)
 
 
 @strawberry.type
 class ProjectResponse:
     success: bool
     message: str
+    project: Optional[Project] = None
 
 
 @strawberry.input
 class ProjectInputCreate:
     project_name: str
     project_description: str
-    start_date: Optional[str] = current_time
-    end_date: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
     responsible_id: Optional[int] = None
 
 
@@ -35,6 +43,6 @@ class ProjectUpdateInput:
     project_id: int
     project_name: Optional[str] = None
     project_description: Optional[str] = None
-    start_date: Optional[str] = None
-    end_date: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
     responsible_id: Optional[int] = None
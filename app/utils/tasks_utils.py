@@ -1,5 +1,9 @@
 import strawberry
 from typing import Optional
+from datetime import date, datetime
+
+from app.db.catalog import catalog
+from app.utils.catalog_utils import UserSummary
 
 
 @strawberry.type
@@ -7,22 +11,29 @@ class Tasks:
     task_id: int
     task_name: str
     task_description: str
-    deadline: str
+    deadline: Optional[date]
     task_status: str
     project_id: int
     responsible_id: int
+    updated_at: datetime
+    version: int
+
+    @strawberry.field
+    def responsible(self) -> Optional[UserSummary]:
+        return catalog.user(self.responsible_id)
 
 
 @strawberry.type
 class TasksResponse:
     success: bool
     message: str
+    task: Optional[Tasks] = None
 
 @strawberry.input
 class TasksInputCreate:
     task_name: str
     task_description: str
-    deadline: Optional[str] = None
+    deadline: Optional[date] = None
     task_status: str
     project_id: int
     responsible_id: int
@@ -32,7 +43,7 @@ class TasksUpdateInput:
     task_id: int
     task_name: Optional[str] = None
     task_description: Optional[str] = None
-    deadline: Optional[str] = None
+    deadline: Optional[date] = None
     task_status: Optional[str] = None
     project_id: Optional[int] = None
     responsible_id: Optional[int] = None
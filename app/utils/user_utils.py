@@ -16,6 +16,7 @@ class User:
 class UserResponse:
     success: bool
     message: str
+    user: Optional[User] = None
 
 
 # @strawberry.input
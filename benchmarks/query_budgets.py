@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, cursor as _cursor
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# Background job workers would add their own statements to the counts
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app.db import config  # noqa: E402
+from app.db.statements import PreparedConnection  # noqa: E402
+from app.security.hash import get_password_hash  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+
+# Round trips per GraphQL operation, checked against the budgets below. Runs the app from
+# main.py in-process against a scratch database (<DB_NAME>_budgets, recreated on every
+# run) on the configured server, so it needs a Postgres the DB_* user can create
+# databases on, plus httpx for Starlette's TestClient. Exits 1 when an operation goes over
+# budget; timings are compared with BASELINE (written with --update-baseline).
+BASELINE = Path(__file__).resolve().parent / "query_budgets_baseline.json"
+PROJECTS, TASKS_PER_PROJECT, COMMENTS_PER_PROJECT, USERS = 20, 10, 5, 30
+
+
+class Operation:
+    def __init__(self, name: str, query: str, statements: int, checkouts: int, variables: dict = None):
+        self.name = name
+        self.query = query
+        self.variables = variables or {}
+        self.statements = statements
+        self.checkouts = checkouts
+
+
+OPERATIONS = [
+    # Auth is answered from the in-memory catalog: these cost nothing but the data query
+    Operation("roles", "{ roles { roleId role } }", statements=0, checkouts=0),
+    Operation("tasks_with_responsible", "{ tasks { taskId taskName responsible { name } } }",
+              statements=1, checkouts=1),
+    Operation("projects_with_responsible", "{ projects { projectId projectName responsible { username } } }",
+              statements=1, checkouts=1),
+    Operation("comments_with_user_since", '{ comments(since: "2000-01-01") { commentId user { name } } }',
+              statements=1, checkouts=1),
+    # Lookups by id in one document go through one DataLoader query
+    Operation("tasks_by_id", "{ a: task(taskId: 1) { taskName } b: task(taskId: 2) { taskName }"
+                             " c: task(taskId: 3) { taskName } d: task(taskId: 4) { responsible { name } } }",
+              statements=1, checkouts=1),
+    # Top-level fields resolve concurrently, each on its own connection
+    Operation("project_and_task", "{ project(projectId: 1) { projectName } task(taskId: 1) { taskName } }",
+              statements=2, checkouts=2),
+    Operation("due_tasks", "{ dueTasks(withinDays: 7) { taskId deadline responsible { name } } }",
+              statements=1, checkouts=1),
+    Operation("changes", "{ changes { tasks { taskId } projects { projectId } comments { commentId } cursor } }",
+              statements=4, checkouts=1),
+    Operation("update_task", 'mutation { updateTask(Input: {taskId: 1, taskStatus: "open"}) { success task { version } } }',
+              statements=1, checkouts=1),
+]
+
+
+class CountingCursor(_cursor):
+    def execute(self, query, vars=None):
+        # PREPARE happens once per pooled connection (see app/db/statements.py), so which
+        # connection an operation lands on must not change its count
+        if self.connection in counts["pooled"] and not query.startswith("PREPARE "):
+            counts["statements"] += 1
+        return super().execute(query, vars)
+
+
+class CountingConnection(PreparedConnection):
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("cursor_factory", CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+
+# Only connections handed out by the pool are counted, not the catalog listener's
+counts = {"statements": 0, "checkouts": 0, "pooled": set()}
+
+
+def count_checkouts(connection_pool):
+    getconn = connection_pool.getconn
+
+    def counting_getconn(*args, **kwargs):
+        connection = getconn(*args, **kwargs)
+        counts["checkouts"] += 1
+        counts["pooled"].add(connection)
+        return connection
+
+    connection_pool.getconn = counting_getconn
+
+
+def create_database(settings) -> str:
+    name = f"{settings.db_name}_budgets"
+    connection = psycopg2.connect(dbname=settings.db_name, user=settings.db_user, password=settings.db_password,
+                                  host=settings.db_host, port=settings.db_port)
+    connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        cursor.execute(f"CREATE DATABASE {name}")
+    connection.close()
+    return name
+
+
+def seed(password: str):
+    with config.get_database_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("INSERT INTO users (username, password, email, name, role_id)"
+                       " SELECT 'user' || g, %s, 'user' || g || '@example.com', 'User ' || g,"
+                       " CASE WHEN g = 1 THEN 1 ELSE 2 END FROM generate_series(1, %s) g",
+                       (get_password_hash(password), USERS))
+        cursor.execute("INSERT INTO projects (project_name, project_description, start_date, responsible_id)"
+                       " SELECT 'project ' || g, 'description', CURRENT_DATE, 1 + g %% %s"
+                       " FROM generate_series(1, %s) g", (USERS, PROJECTS))
+        cursor.execute("INSERT INTO tasks (task_name, task_description, deadline, task_status, project_id,"
+                       " responsible_id) SELECT 'task ' || g, 'description', CURRENT_DATE + g %% 30, 'open',"
+                       " 1 + g %% %s, 1 + g %% %s FROM generate_series(1, %s) g",
+                       (PROJECTS, USERS, PROJECTS * TASKS_PER_PROJECT))
+        cursor.execute("INSERT INTO comments (comment_content, creation_date, user_id, project_id)"
+                       " SELECT 'comment ' || g, CURRENT_DATE - g %% 90, 1 + g %% %s, 1 + g %% %s"
+                       " FROM generate_series(1, %s) g", (USERS, PROJECTS, PROJECTS * COMMENTS_PER_PROJECT))
+
+
+def run(client, token: str, operation: Operation) -> dict:
+    response = client.post("/graphql", json={"query": operation.query, "variables": operation.variables},
+                           headers={"authorization": token})
+    result = response.json()
+    if response.status_code != 200 or result.get("errors"):
+        raise RuntimeError(f"{operation.name} failed: {response.status_code} {result}")
+    return result
+
+
+def measure(client, token: str, operation: Operation, repeat: int) -> tuple:
+    run(client, token, operation)
+    counts["statements"] = counts["checkouts"] = 0
+    run(client, token, operation)
+    statements, checkouts = counts["statements"], counts["checkouts"]
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(client, token, operation)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statements, checkouts, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check statement and connection budgets per GraphQL operation")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per operation (median is reported)")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write the timings to {BASELINE.name}")
+    parser.add_argument("--max-slowdown", type=float,
+                        help="Also fail when an operation is this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.db_name = create_database(settings)
+    config.PreparedConnection = CountingConnection
+    config.config_database()
+    seed("budgets")
+    count_checkouts(config.init_pool())
+
+    from fastapi.testclient import TestClient
+    import main as server
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    timings, failures = {}, []
+    with TestClient(server.app) as client:
+        login = client.post("/graphql", json={"query": 'mutation { login(login: {email: "user1@example.com",'
+                                                       ' password: "budgets"}) { token } }'}).json()
+        token = login["data"]["login"]["token"]
+
+        print(f"{'operation':<28} {'statements':>12} {'checkouts':>10} {'median ms':>10} {'vs baseline':>12}")
+        for operation in OPERATIONS:
+            statements, checkouts, median = measure(client, token, operation, args.repeat)
+            timings[operation.name] = round(median, 3)
+            delta = ""
+            if operation.name in baseline:
+                change = (median - baseline[operation.name]) / baseline[operation.name] * 100
+                delta = f"{change:+.0f}%"
+                if args.max_slowdown is not None and change > args.max_slowdown:
+                    failures.append(f"{operation.name}: {change:+.0f}% slower than the baseline")
+            print(f"{operation.name:<28} {statements:>6} / {operation.statements:<3} {checkouts:>4} / "
+                  f"{operation.checkouts:<3} {median:>10.2f} {delta:>12}")
+            if statements > operation.statements:
+                failures.append(f"{operation.name}: {statements} statements, budget {operation.statements}")
+            if checkouts > operation.checkouts:
+                failures.append(f"{operation.name}: {checkouts} connection checkouts, budget {operation.checkouts}")
+
+    config.close_pool()
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(timings, indent=2) + "\n")
+        print(f"Wrote {BASELINE}")
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
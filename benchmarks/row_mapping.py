@@ -0,0 +1,54 @@
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db.rows import make_row_factory  # noqa: E402
+from app.db.tables import TASKS  # noqa: E402
+from app.utils.tasks_utils import Tasks  # noqa: E402
+
+ROWS = 100_000
+COLUMNS = TASKS.column_names
+
+
+def fake_tasks(count: int) -> list:
+    today, now = date.today(), datetime.now(timezone.utc)
+    return [(task_id, f"task {task_id}", "description", today + timedelta(days=task_id % 30) if task_id % 3 else None,
+             "open", task_id % 100, task_id % 50, now, 1) for task_id in range(count)]
+
+
+def dict_zip_mapping(rows: list) -> list:
+    # Mapping used by the resolvers before the row factory
+    tasks = []
+    for task in rows:
+        task_dict = dict(zip(COLUMNS, task))
+        if task_dict["deadline"] is None:
+            task_dict["deadline"] = "None"
+        task_dict["deadline"] = str(task_dict["deadline"])
+        tasks.append(Tasks(**task_dict))
+    return tasks
+
+
+def row_factory_mapping(rows: list) -> list:
+    return list(map(make_row_factory(Tasks, COLUMNS), rows))
+
+
+def measure(mapping, rows: list, repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        mapping(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(rows) / best
+
+
+if __name__ == "__main__":
+    rows = fake_tasks(ROWS)
+    baseline = measure(dict_zip_mapping, rows)
+    factory = measure(row_factory_mapping, rows)
+    print(f"tasks list, {ROWS} rows")
+    print(f"dict(zip()) + Tasks(**row): {baseline:>12,.0f} rows/sec")
+    print(f"slotted row factory:        {factory:>12,.0f} rows/sec ({factory / baseline:.1f}x)")
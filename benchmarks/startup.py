@@ -0,0 +1,58 @@
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Where a worker's cold start goes: imports grouped by top-level package (measured in a
+# fresh interpreter with -X importtime), then building the schema and the app.
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+TOP = 12
+
+
+def import_times(module: str) -> dict:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            # Self time, so nested imports are not counted twice
+            packages[match.group(4).split(".")[0]] += int(match.group(1)) / 1e6
+    return packages
+
+
+def wall_time(module: str, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def schema_build_time() -> float:
+    import strawberry
+    from app.server import application
+
+    start = time.perf_counter()
+    strawberry.Schema(query=application.Query, mutation=application.Mutation,
+                      directives=[application.defer, application.stream],
+                      extensions=[application.StatementTimeoutExtension])
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    packages = import_times("app.server.application")
+    total = sum(packages.values())
+    print(f"imports of app.server.application: {total:.3f}s")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:TOP]:
+        print(f"  {package:<20} {seconds:.3f}s ({seconds / total:.0%})")
+    print(f"python -c 'import main' (launcher, spawn re-run): {wall_time('main'):.3f}s")
+    print(f"python -c 'import app.server.application' (worker): {wall_time('app.server.application'):.3f}s")
+    print(f"strawberry.Schema(): {schema_build_time():.3f}s")
@@ -1,39 +1,85 @@
-import uvicorn
-import strawberry
+import argparse
+import sys
+from datetime import date
 
-from fastapi import FastAPI
-from strawberry.asgi import GraphQL
+from app.db.config import config_database, close_pool
+from app.settings import get_settings
 
-from app.db.config import config_database
-from app.api.user import UserMutation, UserQuery
-from app.api.login import LoginMutation
-from app.api.projects import ProjectMutation, ProjectQuery
-from app.api.tasks import TaskMutation, TaskQuery
-from app.api.comments import CommentMutation, CommentQuery
+# uvicorn starts each worker with multiprocessing spawn, which runs this script again
+# in the worker before importing the app. The app and the GraphQL stack therefore live
+# in app/server/application.py and are only imported where they are used.
+APP = "app.server.application:app"
 
 
-@strawberry.type
-class Mutation(UserMutation, LoginMutation, ProjectMutation, TaskMutation, CommentMutation):
-    ...
+def __getattr__(name):
+    # Keeps `uvicorn main:app` and main.schema working
+    if name in ("app", "schema"):
+        from app.server import application
+        return getattr(application, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-@strawberry.type
-class Query(UserQuery, ProjectQuery, TaskQuery, CommentQuery):
-    ...
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gestion project GraphQL server")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per core)")
+    parser.add_argument("--skip-setup", action="store_true", help="Do not create tables and roles before serving")
+    parser.add_argument("--setup-only", action="store_true", help="Create tables and roles, then exit")
+    parser.add_argument("--jobs-only", action="store_true", help="Run background job workers instead of the server")
+    parser.add_argument("--job-workers", type=int, help="Job worker threads (default: JOB_WORKERS)")
+    parser.add_argument("--archive-comments-before", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="Archive comment partitions that end on or before this date, then exit")
+    parser.add_argument("--archive-dir", help="Directory for archived partitions (default: COMMENTS_ARCHIVE_DIR)")
+    parser.add_argument("--export-schema", action="store_true", help="Write the schema SDL to schema.graphql, then exit")
+    parser.add_argument("--check-schema", action="store_true",
+                        help="Exit with an error if schema.graphql does not match the schema")
+    return parser.parse_args()
 
 
-app = FastAPI()
+def check_schema(export: bool) -> int:
+    from app.server.application import SCHEMA_PATH, schema
+    sdl = schema.as_str() + "\n"
+    if export:
+        SCHEMA_PATH.write_text(sdl)
+        print(f"Wrote {SCHEMA_PATH}")
+        return 0
+    if not SCHEMA_PATH.exists() or SCHEMA_PATH.read_text() != sdl:
+        print(f"{SCHEMA_PATH.name} is out of date, run python main.py --export-schema", file=sys.stderr)
+        return 1
+    return 0
 
-schema = strawberry.Schema(
-    mutation=Mutation,
-    query=Query
-)
 
-graphql_app = GraphQL(schema)
+if __name__ == "__main__":
+    args = parse_args()
+    settings = get_settings()
 
-app.add_route('/graphql', graphql_app)
+    if args.export_schema or args.check_schema:
+        raise SystemExit(check_schema(args.export_schema))
+
+    # Schema setup runs once in the launcher, never in the request-serving workers.
+    if not args.skip_setup:
+        config_database()
+        close_pool()
+    if args.setup_only:
+        raise SystemExit(0)
+    if args.archive_comments_before:
+        from app.db.partitions import archive_partitions
+        for path in archive_partitions(args.archive_comments_before, args.archive_dir or settings.comments_archive_dir):
+            print(f"Archived {path}")
+        close_pool()
+        raise SystemExit(0)
+    if args.jobs_only:
+        # Job handlers register themselves when their modules are imported
+        from app.db import changes, partitions, purge  # noqa: F401
+        from app.reminders import scheduler  # noqa: F401
+        from app.security import token  # noqa: F401
+        from app.jobs.runner import serve_jobs
+        serve_jobs(args.job_workers)
+        close_pool()
+        raise SystemExit(0)
+
+    import uvicorn
 
-if __name__ == "__main__":
-    config_database()
     # uvicorn.run("main:app", host="localhost", port=8000, reload=True)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(APP, host=settings.server_host, port=settings.server_port,
+                workers=args.workers or settings.workers,
+                timeout_graceful_shutdown=settings.server_graceful_shutdown_timeout)
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from app.server.admission import OPEN_STREAMS, Admission, AdmissionMiddleware, QUERY
+
+
+class AdmissionHandoffTest(unittest.TestCase):
+    def test_handoff_at_deadline_keeps_the_slot(self):
+        async def scenario():
+            admission = Admission(1, {QUERY: 4, "mutation": 4})
+            self.assertTrue(await admission.acquire(QUERY, 1))
+
+            async def handed_off_then_timed_out(future, timeout):
+                # release() sets the waiter's result right as its deadline fires
+                admission.release()
+                self.assertTrue(future.done())
+                raise asyncio.TimeoutError()
+
+            with mock.patch("asyncio.wait_for", handed_off_then_timed_out):
+                self.assertTrue(await admission.acquire(QUERY, 1))
+            self.assertEqual(admission.active, 1)
+
+            admission.release()
+            self.assertEqual(admission.active, 0)
+            self.assertTrue(await admission.acquire(QUERY, 0))
+
+        asyncio.run(scenario())
+
+    def test_timeout_without_handoff_is_refused(self):
+        async def scenario():
+            admission = Admission(1, {QUERY: 4, "mutation": 4})
+            self.assertTrue(await admission.acquire(QUERY, 1))
+            self.assertFalse(await admission.acquire(QUERY, 0.01))
+            self.assertEqual(admission.active, 1)
+            self.assertEqual(admission.queued(), 0)
+
+        asyncio.run(scenario())
+
+
+class OpenStreamsTest(unittest.TestCase):
+    def test_slot_is_held_until_the_streams_close(self):
+        async def scenario():
+            first_part, cursor_closed, finish = asyncio.Event(), asyncio.Event(), asyncio.Event()
+
+            async def app(scope, receive, send):
+                await receive()
+                scope[OPEN_STREAMS].opened()
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(b"content-type", b"multipart/mixed; boundary=-")]})
+                await send({"type": "http.response.body", "body": b"first", "more_body": True})
+                first_part.set()
+                await cursor_closed.wait()
+                scope[OPEN_STREAMS].closed()
+                await finish.wait()
+                await send({"type": "http.response.body", "body": b"last", "more_body": False})
+
+            middleware = AdmissionMiddleware(app, max_concurrent=1, request_deadline=0.05)
+
+            async def receive():
+                return {"type": "http.request", "body": b'{"query": "{ tasks { taskId } }"}', "more_body": False}
+
+            async def send(message):
+                pass
+
+            request = asyncio.ensure_future(middleware({"type": "http", "path": "/graphql", "method": "POST",
+                                                        "headers": []}, receive, send))
+            await first_part.wait()
+            # Past the deadline: the response is not cancelled, but its cursor keeps the slot
+            await asyncio.sleep(0.1)
+            self.assertFalse(request.done())
+            self.assertEqual(middleware.admission.active, 1)
+
+            cursor_closed.set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(middleware.admission.active, 0)
+            finish.set()
+            await request
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from app.server.compression import negotiate_encoding
+
+
+class NegotiateEncodingTest(unittest.TestCase):
+    def test_highest_quality_wins(self):
+        self.assertEqual(negotiate_encoding("br;q=0.5, gzip;q=0.9"), "gzip")
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, br"), "br")
+
+    def test_brotli_on_a_tie(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate, br"), "br")
+
+    def test_refused_and_unknown_codings(self):
+        self.assertEqual(negotiate_encoding("br;q=0, gzip"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, deflate"))
+        self.assertIsNone(negotiate_encoding(""))
+
+    def test_wildcard(self):
+        self.assertEqual(negotiate_encoding("*;q=0.5, br;q=0.1"), "gzip")
+        self.assertIsNone(negotiate_encoding("identity, *;q=0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
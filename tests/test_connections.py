@@ -0,0 +1,26 @@
+import unittest
+
+from psycopg2.errors import QueryCanceled
+
+from app.db.config import ConnectionTracker, get_database_connection, track_connections
+
+
+class CancelledTrackerTest(unittest.TestCase):
+    def test_no_connection_is_checked_out_after_cancel(self):
+        tracker = ConnectionTracker()
+        tracker.cancel()
+        with track_connections(tracker):
+            with self.assertRaises(QueryCanceled):
+                with get_database_connection():
+                    self.fail("checked out a connection for a cancelled request")
+
+    def test_cancelled_tracker_refuses_connections(self):
+        tracker = ConnectionTracker()
+        self.assertTrue(tracker.add("connection"))
+        tracker.discard("connection")
+        tracker.cancel()
+        self.assertFalse(tracker.add("connection"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import unittest
+
+import orjson
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# Background job workers are not needed here
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app.db import config  # noqa: E402
+from app.security.hash import get_password_hash  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+
+# Runs the app against a scratch database (<DB_NAME>_tests, recreated on every run) on the
+# configured server; skipped when that server cannot be reached
+COMMENTS = 120
+
+
+def create_database(settings) -> str:
+    name = f"{settings.db_name}_tests"
+    connection = psycopg2.connect(dbname=settings.db_name, user=settings.db_user, password=settings.db_password,
+                                  host=settings.db_host, port=settings.db_port, connect_timeout=2)
+    connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        cursor.execute(f"CREATE DATABASE {name}")
+    connection.close()
+    return name
+
+
+def parts(body: bytes) -> list:
+    return [orjson.loads(part.split(b"\r\n\r\n", 1)[1]) for part in body.split(b"\r\n--")[1:]
+            if b"\r\n\r\n" in part]
+
+
+class StreamSinceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        settings = get_settings()
+        cls.db_name = settings.db_name
+        try:
+            settings.db_name = create_database(settings)
+        except psycopg2.OperationalError as e:
+            raise unittest.SkipTest(f"No database server: {e}")
+        config.close_pool()
+        config.config_database()
+        with config.get_database_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("INSERT INTO users (username, password, email, name, role_id)"
+                           " VALUES ('admin', %s, 'admin@example.com', 'Admin', 1)", (get_password_hash("pw"),))
+            cursor.execute("INSERT INTO projects (project_name, project_description, start_date, responsible_id)"
+                           " VALUES ('project', 'description', CURRENT_DATE, 1)")
+            cursor.execute("INSERT INTO comments (comment_content, creation_date, user_id, project_id)"
+                           " SELECT 'comment ' || g, CURRENT_DATE - g %% 90, 1, 1 FROM generate_series(1, %s) g",
+                           (COMMENTS,))
+
+        from fastapi.testclient import TestClient
+        import main as server
+
+        cls.client_context = TestClient(server.app)
+        cls.client = cls.client_context.__enter__()
+        login = cls.client.post("/graphql", json={"query": 'mutation { login(login: {email: "admin@example.com",'
+                                                           ' password: "pw"}) { token } }'}).json()
+        cls.token = login["data"]["login"]["token"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_context.__exit__(None, None, None)
+        config.close_pool()
+        get_settings().db_name = cls.db_name
+
+    def post(self, query: str, accept: str = "application/json"):
+        response = self.client.post("/graphql", json={"query": query},
+                                    headers={"authorization": self.token, "accept": accept})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_streamed_comments_since_match_the_plain_query(self):
+        dates = sorted(comment["creationDate"] for comment in
+                       self.post("{ comments { creationDate } }").json()["data"]["comments"])
+        since = dates[COMMENTS // 2]
+
+        expected = self.post(f'{{ comments(since: "{since}") {{ commentId creationDate }} }}').json()
+        expected = expected["data"]["comments"]
+        self.assertTrue(0 < len(expected) < COMMENTS)
+
+        payloads = parts(self.post(f'{{ comments(since: "{since}") @stream(initialCount: 3)'
+                                   f' {{ commentId creationDate }} }}', "multipart/mixed").content)
+        streamed = payloads[0]["data"]["comments"] + [item for payload in payloads[1:]
+                                                      for incremental in payload.get("incremental", ())
+                                                      for item in incremental["items"]]
+        self.assertEqual(sorted(streamed, key=lambda comment: comment["commentId"]),
+                         sorted(expected, key=lambda comment: comment["commentId"]))
+
+
+if __name__ == "__main__":
+    unittest.main()